@@ -0,0 +1,85 @@
+"""Benchmark the bulk dynalog snapshot parser against the previous csv.reader, row-by-row parsing.
+
+The demo dynalogs are scaled up by repeating their snapshot rows; both parsers are then timed on the same files
+and their peak memory measured with tracemalloc.
+
+Run from the repository root::
+
+    $ python benchmarks/dlog_parser.py
+"""
+import csv
+import os.path as osp
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from pylinac.log_analyzer import read_dlog_snapshots, DLOG_HEADER_ROWS
+
+demo_dir = osp.join(osp.dirname(osp.dirname(osp.abspath(__file__))), 'pylinac', 'demo_files', 'log_reader')
+scale_factors = (1, 10, 100)
+repeats = 3
+
+
+def read_dlog_snapshots_csv(dlg_filename):
+    """The previous parser: build the matrix from a Python list of csv rows."""
+    with open(dlg_filename) as csvf:
+        dlgdata = csv.reader(csvf, delimiter=',')
+        return np.array([line for line in dlgdata if int(dlgdata.line_num) > DLOG_HEADER_ROWS], dtype=float)
+
+
+def write_scaled_dlog(src_filename, dst_filename, scale):
+    """Write a copy of a dynalog with its snapshot rows repeated ``scale`` times."""
+    with open(src_filename) as f:
+        lines = f.read().strip().split('\n')
+    header, body = lines[:DLOG_HEADER_ROWS], lines[DLOG_HEADER_ROWS:]
+    with open(dst_filename, 'w') as f:
+        f.write('\n'.join(header + body * scale) + '\n')
+
+
+def best_time(func, filename):
+    """Return the best time of several runs of func(filename)."""
+    times = []
+    for _ in range(repeats):
+        start = time.time()
+        func(filename)
+        times.append(time.time() - start)
+    return min(times)
+
+
+def peak_memory(func, filename):
+    """Return the peak memory in MB allocated while running func(filename)."""
+    tracemalloc.start()
+    func(filename)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def run():
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print("{:>10} {:>10} {:>10} {:>8} {:>12} {:>12}".format('snapshots', 'csv (s)', 'bulk (s)', 'speedup',
+                                                               'csv (MB)', 'bulk (MB)'))
+        for scale in scale_factors:
+            for name in ('AQA.dlg', 'BQA.dlg'):
+                filename = osp.join(tmp_dir, name)
+                write_scaled_dlog(osp.join(demo_dir, name), filename, scale)
+                if not np.array_equal(read_dlog_snapshots_csv(filename), read_dlog_snapshots(filename)):
+                    raise ValueError("Parsers disagree on {} scaled {}x".format(name, scale))
+            filename = osp.join(tmp_dir, 'AQA.dlg')
+            num_snapshots = len(read_dlog_snapshots(filename))
+            csv_time = best_time(read_dlog_snapshots_csv, filename)
+            bulk_time = best_time(read_dlog_snapshots, filename)
+            csv_memory = peak_memory(read_dlog_snapshots_csv, filename)
+            bulk_memory = peak_memory(read_dlog_snapshots, filename)
+            print("{:>10} {:>10.4f} {:>10.4f} {:>7.1f}x {:>12.1f} {:>12.1f}".format(
+                num_snapshots, csv_time, bulk_time, csv_time / bulk_time, csv_memory, bulk_memory))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,55 @@
+"""Benchmark the search-based gamma against the Bakai gamma approximation on 60x4000 fluence maps.
+
+The demo dynalog is analyzed at 0.1mm resolution (60 leaf pairs x 4000 pixels) as delivered, and again with its
+actual leaf positions offset to create disagreement everywhere the leaves are, which is the worst case for the search.
+Each case is timed for several search radii.
+
+Run from the repository root::
+
+    $ python benchmarks/gamma_search.py
+"""
+import os.path as osp
+import time
+
+from pylinac.log_analyzer import MachineLog
+
+demo_file = osp.join(osp.dirname(osp.dirname(osp.abspath(__file__))), 'pylinac', 'demo_files', 'log_reader', 'AQA.dlg')
+leaf_offsets = (0, 0.02, 0.1)  # cm
+search_radii = (1, 3, 10)  # mm
+repeats = 3
+
+
+def load_log(leaf_offset):
+    """Load the demo dynalog with its actual leaf positions opened by leaf_offset and its fluences calculated."""
+    log = MachineLog(demo_file)
+    log.axis_data.mlc.actual += leaf_offset
+    log.fluence.actual.calc_map()
+    log.fluence.expected.calc_map()
+    return log
+
+
+def best_time(log, **kwargs):
+    """Return the best time of several gamma calculations, along with the gamma pass percent."""
+    times = []
+    for _ in range(repeats):
+        log.fluence.gamma._gamma_maps.cache_clear()
+        start = time.time()
+        log.fluence.gamma.calc_map(**kwargs)
+        times.append(time.time() - start)
+    return min(times), log.fluence.gamma.pass_prcnt
+
+
+def run():
+    print("{:>12} {:>10} {:>12} {:>10} {:>10}".format('offset (cm)', 'method', 'radius (mm)', 'time (s)', 'pass %'))
+    for leaf_offset in leaf_offsets:
+        log = load_log(leaf_offset)
+        bakai_time, pass_prcnt = best_time(log)
+        print("{:>12} {:>10} {:>12} {:>10.4f} {:>10.2f}".format(leaf_offset, 'bakai', '-', bakai_time, pass_prcnt))
+        for search_radius in search_radii:
+            search_time, pass_prcnt = best_time(log, method='search', search_radius=search_radius)
+            print("{:>12} {:>10} {:>12} {:>10.4f} {:>10.2f}".format(leaf_offset, 'search', search_radius, search_time,
+                                                                   pass_prcnt))
+
+
+if __name__ == '__main__':
+    run()
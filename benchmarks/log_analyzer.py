@@ -0,0 +1,150 @@
+"""Benchmark the log analyzer hot paths on large synthetic trajectory logs and dynalogs.
+
+Trajectory logs with HD and Millennium MLCs and a Millennium dynalog A/B pair are synthesized with 120 leaves
+(by default 100,000 snapshots) of a sliding-window delivery with small leaf errors and a few beam holds; see
+``write_synthetic_tlog()`` and ``write_synthetic_dlog()``. For each log,
+loading (``Tlog_Axis_Data._read``/``Dlog_Axis_Data._read``), the MLC RMS and error percentile methods,
+``Fluence.calc_map`` and ``GammaFluence.calc_map`` are timed, and their peak memory measured with tracemalloc.
+The results are printed and written to a JSON report, which can be compared with the report of another version.
+
+Run from the repository root::
+
+    $ python benchmarks/log_analyzer.py --output report.json
+    $ python benchmarks/log_analyzer.py --snapshots 20000 --compare report.json
+    $ python benchmarks/log_analyzer.py --dtype float32 --compare report.json
+"""
+import argparse
+import json
+import os.path as osp
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import pylinac
+from pylinac.core.decorators import clear_caches
+from pylinac.log_analyzer import MachineLog, write_synthetic_tlog, write_synthetic_dlog
+
+repeats = 3
+num_leaves = 120
+tlog_models = {'tlog-HD': 3, 'tlog-Millennium': 2}  # name: MLC model in the header
+
+
+def write_logs(directory, num_snapshots):
+    """Write the benchmark logs and return their filenames keyed by name."""
+    options = dict(num_snapshots=num_snapshots, num_leaves=num_leaves, leaf_error=0.005, leaf_offset=-0.01,
+                   num_beam_holds=3, hold_length=50, seed=0)
+    logs = {}
+    for name, mlc_model in tlog_models.items():
+        logs[name] = write_synthetic_tlog(osp.join(directory, name + '.bin'), mlc_model=mlc_model, num_subbeams=2,
+                                          **options)
+    logs['dlog-Millennium'] = write_synthetic_dlog(osp.join(directory, 'Abenchmark.dlg'), **options)[0]
+    return logs
+
+
+def measure(func, setup=None):
+    """Return the best time in seconds of several runs of func, and the peak memory in MB allocated by one run.
+
+    setup is called before each run, untimed, and its return value is passed to func."""
+    times = []
+    for _ in range(repeats):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+    arg = setup() if setup is not None else None
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'time': min(times), 'peak_memory': peak / 2**20}
+
+
+def benchmark_log(filename, dtype=None):
+    """Return the timing and memory results of the hot paths of a log, keyed by hot path name."""
+    log = MachineLog(filename, dtype=dtype)
+    mlc = log.axis_data.mlc
+
+    def cleared_mlc(_=None):
+        clear_caches(mlc)
+        return mlc
+
+    def cleared_fluence(_=None):
+        clear_caches(log.fluence.actual)
+        return log.fluence.actual
+
+    def cleared_gamma(_=None):
+        log.fluence.actual.calc_map()
+        log.fluence.expected.calc_map()
+        clear_caches(log.fluence.gamma)
+        return log.fluence.gamma
+
+    return {
+        'load': measure(lambda _: MachineLog(filename, dtype=dtype)),
+        'mlc.get_RMS_avg': measure(lambda mlc: mlc.get_RMS_avg(), cleared_mlc),
+        'mlc.get_RMS_max': measure(lambda mlc: mlc.get_RMS_max(), cleared_mlc),
+        'mlc.get_RMS_percentile': measure(lambda mlc: mlc.get_RMS_percentile(), cleared_mlc),
+        'mlc.get_error_percentile': measure(lambda mlc: mlc.get_error_percentile(), cleared_mlc),
+        'Fluence.calc_map': measure(lambda fluence: fluence.calc_map(), cleared_fluence),
+        'GammaFluence.calc_map': measure(lambda gamma: gamma.calc_map(), cleared_gamma),
+    }
+
+
+def compare(report, baseline):
+    """Print the time and memory ratios of a report to a baseline report."""
+    print("\nCompared to pylinac {}:".format(baseline['pylinac_version']))
+    print("{:>16} {:>26} {:>12} {:>12}".format('log', 'hot path', 'time ratio', 'memory ratio'))
+    for log_name, results in sorted(report['results'].items()):
+        for path, result in sorted(results.items()):
+            base = baseline['results'].get(log_name, {}).get(path)
+            if base is None:
+                continue
+            print("{:>16} {:>26} {:>12.2f} {:>12.2f}".format(log_name, path, result['time'] / base['time'],
+                                                             result['peak_memory'] / max(base['peak_memory'], 1e-9)))
+
+
+def run(num_snapshots=100000, output=None, baseline=None, dtype=None):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        logs = write_logs(tmp_dir, num_snapshots)
+
+        report = {
+            'pylinac_version': pylinac.__version__,
+            'numpy_version': np.__version__,
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'num_leaves': num_leaves,
+            'num_snapshots': num_snapshots,
+            'repeats': repeats,
+            'dtype': dtype,
+            'units': {'time': 's', 'peak_memory': 'MB'},
+            'results': {},
+        }
+        print("{:>16} {:>26} {:>10} {:>12}".format('log', 'hot path', 'time (s)', 'peak (MB)'))
+        for name, filename in sorted(logs.items()):
+            report['results'][name] = benchmark_log(filename, dtype)
+            for path, result in report['results'][name].items():
+                print("{:>16} {:>26} {:>10.4f} {:>12.1f}".format(name, path, result['time'], result['peak_memory']))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if baseline is not None:
+        with open(baseline) as f:
+            compare(report, json.load(f))
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--snapshots', type=int, default=100000, help="The number of snapshots of each log.")
+    parser.add_argument('--output', help="The path of the JSON report to write.")
+    parser.add_argument('--compare', help="The path of a JSON report to compare the results with.")
+    parser.add_argument('--dtype', help="The dtype to load the logs with, e.g. float32; see MachineLog.load().")
+    args = parser.parse_args()
+    run(args.snapshots, args.output, args.compare, args.dtype)
@@ -8,13 +8,14 @@ Currently only Varian (CatPhan 504) is supported, but Elekta (CatPhan 503) suppo
 """
 from abc import ABCMeta, abstractproperty
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 import os
 import os.path as osp
 import zipfile
 import math
+import warnings
 from io import BytesIO
-from functools import lru_cache
 
 import numpy as np
 from scipy import ndimage
@@ -23,7 +24,8 @@ import dicom
 from dicom.errors import InvalidDicomError
 import matplotlib.pyplot as plt
 
-from pylinac.core.decorators import value_accept, type_accept
+from pylinac.core.decorators import value_accept, type_accept, lazyproperty, instance_cache
+from pylinac.core.cache import cached_analysis, get_volume_cache, make_key
 from pylinac.core.image import Image
 from pylinac.core.geometry import Point, Circle, sector_mask, Line
 from pylinac.core.profile import CircleProfile, Profile, CollapsedCircleProfile
@@ -60,7 +62,7 @@ class CBCT:
         >>> print(mycbct.return_results())
         >>> mycbct.plot_analyzed_image()
     """
-    def __init__(self, folderpath=None):
+    def __init__(self, folderpath=None, targeted=False):
         self.settings = None
         self.HU = None
         self.UN = None
@@ -68,7 +70,7 @@ class CBCT:
         self.LOCON = None
         self.SR = None
         if folderpath is not None:
-            self.load_folder(folderpath)
+            self.load_folder(folderpath, targeted)
 
     @classmethod
     def from_demo_images(cls):
@@ -127,13 +129,18 @@ class CBCT:
         if folder:
             self.load_folder(folder)
 
-    def load_folder(self, folder):
+    def load_folder(self, folder, targeted=False):
         """Load the CT DICOM files string input.
 
         Parameters
         ----------
         folder : str
             Path to the folder.
+        targeted : bool
+            If True, only the images the analysis uses, those of the analyzed phantom modules and their neighbors, are
+            decoded; the other images of the volume are left blank. This is faster for large datasets.
+
+            .. versionadded:: 0.8.0
 
         Raises
         ------
@@ -144,7 +151,7 @@ class CBCT:
             raise NotADirectoryError("Path given was not a Directory/Folder")
 
         filelist = self._get_CT_filenames_from_folder(folder)
-        self._load_files(filelist)
+        self._load_files(filelist, targeted=targeted)
 
     @classmethod
     def from_zip_file_UI(cls):
@@ -165,22 +172,27 @@ class CBCT:
         self.load_zip_file(zfile)
 
     @classmethod
-    def from_zip_file(cls, zip_file):
+    def from_zip_file(cls, zip_file, targeted=False):
         """Construct a CBCT object and pass the zip file.
 
         .. versionadded:: 0.6
         """
         obj = cls()
-        obj.load_zip_file(zip_file)
+        obj.load_zip_file(zip_file, targeted)
         return obj
 
-    def load_zip_file(self, zip_file):
+    def load_zip_file(self, zip_file, targeted=False):
         """Load a CBCT dataset from a zip file.
 
         Parameters
         ----------
         zip_file : str, ZipFile
             Path to the zip file or a ZipFile object.
+        targeted : bool
+            If True, only the images the analysis uses, those of the analyzed phantom modules and their neighbors, are
+            decoded; the other images of the volume are left blank. This is faster for large datasets.
+
+            .. versionadded:: 0.8.0
 
         Raises
         ------
@@ -195,7 +207,7 @@ class CBCT:
             raise FileExistsError("Files given were not valid zip files")
 
         filelist = self._get_CT_filenames_from_zip(zfs)
-        self._load_files(filelist, is_zip=True, zfiles=zfs)
+        self._load_files(filelist, is_zip=True, zfiles=zfs, targeted=targeted)
 
     def _get_CT_filenames_from_folder(self, folder):
         """Walk through a folder to find DICOM CT images.
@@ -223,63 +235,152 @@ class CBCT:
             return filelist
         raise FileNotFoundError("CT images were not found in the specified folder.")
 
-    def _load_files(self, file_list, is_zip=False, zfiles=None):
+    def _load_files(self, file_list, is_zip=False, zfiles=None, workers=None, targeted=False):
         """Load CT DICOM files given a list of image paths.
 
+        The headers are read first to validate the files and sort them by slice position. The images are then
+        decoded in a thread pool, each directly into its sorted position of the image volume. If a volume cache is set
+        (see :func:`~pylinac.core.cache.set_volume_cache_dir`), the volume is stored there and loaded memory-mapped.
+
         Parameters
         ----------
         file_list : list
             List containing strings to the CT images.
-        im_size : int
-            Specifies the size of images the DICOM images should be resized to;
-            used for simplicity of algorithm.
+        is_zip : bool
+            Whether the images are members of the zip file ``zfiles``.
+        workers : int, None
+            The number of threads decoding the images. If None, the number of CPUs is used.
+        targeted : bool
+            If True, only the images the analysis uses are decoded; see :meth:`_read_targeted_dcm_images`.
+            Such partial volumes aren't stored in the volume cache, though a cached volume is still used.
         """
-        images, raw_im_order, dcm = self._validate_and_get_dcm_info(file_list, is_zip, zfiles)
-        sorted_images = self._sort_images(raw_im_order, images)
-        self.settings = Settings(sorted_images, dcm)
+        dcm, im_order, uids = self._read_dcm_headers(file_list, is_zip, zfiles)
+        if get_volume_cache() is not None:
+            images = self._read_cached_dcm_images(file_list, im_order, uids, dcm, is_zip, zfiles, workers, targeted)
+        elif targeted:
+            images = self._read_targeted_dcm_images(file_list, im_order, dcm, is_zip, zfiles, workers)
+        else:
+            images = self._read_dcm_images(file_list, im_order, is_zip, zfiles, workers)
+        self.settings = Settings(images, dcm)
 
-    def _validate_and_get_dcm_info(self, file_list, is_zip, zfiles=None):
-        """Read in the images and perform validation."""
-        IMAGE_SIZE = 512
+    @staticmethod
+    def _open_dcm(item, is_zip, zfiles=None):
+        """Return the DICOM file of a list item, which is either a path or the name of a zip file member."""
+        if is_zip:
+            return BytesIO(zfiles.read(item))
+        return item
 
-        # initialize image array
-        images = np.zeros([IMAGE_SIZE, IMAGE_SIZE, len(file_list)], dtype=int)
-        raw_im_order = np.zeros(len(file_list))
+    def _read_dcm_headers(self, file_list, is_zip, zfiles=None):
+        """Read the headers of the images and validate that they're from the same study.
 
-        # load dicom files from list names and get the image slice position
+        Returns
+        -------
+        dicom Dataset
+            The header of the last image, which holds the metadata of the dataset.
+        numpy.array
+            The order of the files by slice position.
+        list
+            The SOP instance UIDs of the images, by slice position.
+        """
+        im_positions = np.zeros(len(file_list))
+        uids = []
         rd = None
         for idx, item in enumerate(file_list):
-            if is_zip:
-                item = BytesIO(zfiles.read(item))
-            dcm = dicom.read_file(item)
+            dcm = dicom.read_file(self._open_dcm(item, is_zip, zfiles), stop_before_pixels=True)
             if rd and rd != dcm.ReconstructionDiameter:
                 raise InvalidDicomError("CBCT dataset images are not from the same study")
             rd = dcm.ReconstructionDiameter
-            raw_im_order[idx] = dcm.ImagePositionPatient[-1]
+            im_positions[idx] = dcm.ImagePositionPatient[-1]
+            uids.append(str(dcm.SOPInstanceUID))
+        im_order = np.argsort(im_positions, kind='mergesort')
+        return dcm, im_order, [uids[idx] for idx in im_order]
 
+    def _read_dcm_images(self, file_list, im_order, is_zip, zfiles=None, workers=None, positions=None, images=None):
+        """Decode the images into one volume, in the given file order, converting them to HU.
+
+        The volume is int16 and Fortran-ordered, so that each image is contiguous in memory.
+        If ``positions`` is given, only the images at those positions of the volume are decoded, into ``images`` if
+        it's given.
+        """
+        IMAGE_SIZE = 512
+        if images is None:
+            images = np.zeros((IMAGE_SIZE, IMAGE_SIZE, len(file_list)), dtype=np.int16, order='F')
+        if positions is None:
+            positions = range(len(file_list))
+
+        def read_image(position):
+            dcm = dicom.read_file(self._open_dcm(file_list[im_order[position]], is_zip, zfiles))
+            image = dcm.pixel_array
             # resize image if need be
-            if dcm.pixel_array.shape != (IMAGE_SIZE, IMAGE_SIZE):
-                image = imresize(dcm.pixel_array, (IMAGE_SIZE, IMAGE_SIZE))
-            else:
-                image = dcm.pixel_array
-            # place image into images array
-            images[:, :, idx] = image
-        self._convert_imgs2HU(images, dcm)
+            if image.shape != (IMAGE_SIZE, IMAGE_SIZE):
+                image = imresize(image, (IMAGE_SIZE, IMAGE_SIZE))
+            images[:, :, position] = self._convert_imgs2HU(image, dcm)
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            list(executor.map(read_image, positions))  # raise any errors of the workers
+        return images
+
+    def _read_targeted_dcm_images(self, file_list, im_order, dcm, is_zip, zfiles=None, workers=None):
+        """Decode only the images the analysis uses into the volume.
 
-        return images, raw_im_order, dcm
+        Every few images, spaced less than half the width of the HU linearity module apart, are decoded to locate the
+        module. All the images around the located module are then decoded, so that the HU linearity slice is found as
+        if every image were, and finally the images of the other analyzed modules and their neighbors.
+        If the module isn't located, all the images are decoded.
+        """
+        COARSE_SPACING = 8  # mm; the HU linearity module is 25mm wide
+        num_images = len(file_list)
+        step = max(int(COARSE_SPACING / dcm.SliceThickness), 1)
+        coarse_positions = range(0, num_images, step)
+        images = self._read_dcm_images(file_list, im_order, is_zip, zfiles, workers, coarse_positions)
+        decoded = set(coarse_positions)
+
+        settings = Settings(images, dcm)
+        candidates = settings._find_HU_slice_candidates()
+        hu_positions = [position for position in candidates if settings._is_HU_slice(position)]
+        if hu_positions:
+            module_positions = range(max(min(hu_positions) - step, 0), min(max(hu_positions) + step + 1, num_images))
+        else:
+            module_positions = range(num_images)
+        positions = [position for position in module_positions if position not in decoded]
+        self._read_dcm_images(file_list, im_order, is_zip, zfiles, workers, positions, images)
+        decoded.update(positions)
+
+        settings = Settings(images, dcm)
+        positions = set()
+        for attr in ('hu_slice_num', 'un_slice_num', 'sr_slice_num', 'lc_slice_num'):
+            try:
+                slice_num = getattr(settings, attr)
+            except ValueError:  # beyond the image extent; analysis will raise
+                continue
+            positions.update(range(max(slice_num - 1, 0), min(slice_num + 2, num_images)))
+        self._read_dcm_images(file_list, im_order, is_zip, zfiles, workers, sorted(positions - decoded), images)
+        return images
 
-    def _sort_images(self, im_order, images):
-        """Sort and return the images according to the image order."""
-        sorted_images = np.zeros(images.shape, dtype=int)
-        for new, old in enumerate(np.argsort(im_order)):
-            sorted_images[:, :, new] = images[:, :, old]
-        return sorted_images
+    def _read_cached_dcm_images(self, file_list, im_order, uids, dcm, is_zip, zfiles=None, workers=None,
+                                targeted=False):
+        """Return the image volume from the volume cache, memory-mapped, keyed by the SOP instance UIDs of the images.
+        If it isn't cached, the images are decoded and the volume stored first, unless the loading is targeted."""
+        cache = get_volume_cache()
+        key = make_key('pylinac.cbct.volume', sorted(uids))
+        found, entry = cache.get(key)
+        if found and entry[1].get('SOPInstanceUIDs') == uids:
+            return entry[0]
+        if targeted:
+            return self._read_targeted_dcm_images(file_list, im_order, dcm, is_zip, zfiles, workers)
+
+        images = self._read_dcm_images(file_list, im_order, is_zip, zfiles, workers)
+        try:
+            cache.set(key, images, {'SOPInstanceUIDs': uids})
+        except OSError as e:
+            warnings.warn("The CBCT images could not be cached: {}".format(e))
+            return images
+        found, entry = cache.get(key)
+        return entry[0] if found else images
 
     def _convert_imgs2HU(self, images, dcm):
         """Convert the images from CT# to HU."""
-        images *= dcm.RescaleSlope
-        images += dcm.RescaleIntercept
-        return images
+        return images * dcm.RescaleSlope + dcm.RescaleIntercept
 
     def _construct_HU(self):
         """Construct the Houndsfield Unit Slice and its ROIs."""
@@ -420,7 +521,8 @@ class CBCT:
                                                    self.GEO.get_line_lengths(), self.GEO.overall_passed)
         return string
 
-    def analyze(self, hu_tolerance=40, scaling_tolerance=1):
+    @cached_analysis(state=True, shared=lambda cbct: (cbct.settings.images,), ignore=('workers',))
+    def analyze(self, hu_tolerance=40, scaling_tolerance=1, workers=1):
         """Single-method full analysis of CBCT DICOM files.
 
         Parameters
@@ -435,6 +537,12 @@ class CBCT:
             the phantom is further toward the gantry stand; negative means the phantom is further away from the gantry stand.
             Also consider the slice thickness you're using. E.g. if the phantom was 2cm (20mm) toward the gantry and the slice thickness
             was 2mm, the offset should be set to 20/2 = 10.
+        workers : int
+            The number of threads analyzing the phantom modules concurrently, and checking the candidate HU linearity
+            slices (see :attr:`Settings.workers`). What the modules share, the slice locations and the phantom roll,
+            is determined first.
+
+            .. versionadded:: 0.8.0
         """
         if not self.images_loaded:
             raise AttributeError("Images not yet loaded")
@@ -442,13 +550,23 @@ class CBCT:
         # set various setting values
         self.settings.hu_tolerance = hu_tolerance
         self.settings.scaling_tolerance = scaling_tolerance
+        self.settings.workers = workers
 
         # Analysis
-        self._construct_HU()
-        self._construct_UNIF()
-        self._construct_GEO()
-        self._construct_SR()
-        self._construct_Locon()
+        constructors = (self._construct_HU, self._construct_UNIF, self._construct_GEO, self._construct_SR,
+                        self._construct_Locon)
+        if workers > 1:
+            # determine the shared settings once rather than in every thread
+            self.settings.hu_slice_num
+            self.settings.phantom_roll
+            self.settings.expected_phantom_size
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(construct) for construct in constructors]
+            for future in futures:
+                future.result()  # raise any errors of the analyses
+        else:
+            for construct in constructors:
+                construct()
 
     def run_demo(self, show=True):
         """Run the CBCT demo using high-quality head protocol images."""
@@ -457,6 +575,14 @@ class CBCT:
         print(self.return_results())
         self.plot_analyzed_image(show)
 
+    def _cache_inputs(self):
+        """The data the analysis depends on, which keys the analysis cache; see :mod:`~pylinac.core.cache`.
+        The image volume itself isn't stored in the cache."""
+        if self.images_loaded:
+            metadata = self.settings.dicom_metadata
+            return (self.settings.images, self.settings.threshold, metadata.DataCollectionDiameter,
+                    metadata.PixelSpacing[0], metadata.SliceThickness)
+
     @property
     def images_loaded(self):
         """Boolean property specifying if the images have been loaded."""
@@ -478,10 +604,15 @@ class Settings:
         The HU tolerance value for both HU uniformity and linearity. Default is 40.
     scaling_tolerance : float, int
         The scaling tolerance in mm of the geometric nodes on the HU linearity slice (CTP404 module). Default is 1.
+    workers : int
+        The number of threads checking the candidate HU linearity slices. Default is 1.
+
+        .. versionadded:: 0.8.0
     """
     threshold = typed_property('threshold', int)
     hu_tolerance = typed_property('hu_tolerance', (int, float))
     scaling_tolerance = typed_property('scaling_tolerance', (int, float))
+    workers = typed_property('workers', int)
 
     def __init__(self, images, dicom_metadata):
         self.images = images
@@ -489,40 +620,106 @@ class Settings:
         self.threshold = -800
         self.hu_tolerance = 40
         self.scaling_tolerance = 1
+        self.workers = 1
+
+    def __getstate__(self):
+        # the number of workers only controls execution; it isn't stored with cached analyses
+        state = self.__dict__.copy()
+        state.pop('_workers', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.workers = 1
 
-    @lru_cache()
+    @instance_cache()
     def _find_HU_slice(self):
-        """Using a brute force search of the images, find the median HU linearity slice.
+        """Find the median HU linearity slice.
 
-        This method walks through all the images and takes a collapsed circle profile where the HU
-        linearity ROIs are. If the profile contains both low (<800) and high (>800) HU values and most values are the same
-        (i.e. its not an artifact, then
-        it can be assumed it is an HU linearity slice. The median of all applicable slices is the
-        center of the HU slice.
+        A ring of pixels where the HU linearity ROIs are, around the phantom center of one image, is sampled from all
+        the images at once, and the images whose ring is near the HU linearity criteria are the candidates. All the
+        candidates are checked with a collapsed circle profile around their own phantom center (see
+        :meth:`_is_HU_slice`), then every image between the lowest and highest HU linearity slices found, so that a
+        noisy image within the module doesn't split it. The images beyond are then checked outward until several in a
+        row fail, which marks the edges of the module. If no candidate is an HU linearity slice, all the images are
+        checked. The median of all HU linearity slices is the center of the HU slice.
 
         Returns
         -------
         int
             The middle slice of the HU linearity module.
         """
-        hu_slices = []
-        for image_number in range(self.num_images):
-            image = self.images[:, :, image_number]
-            slice = Slice(self, Image.from_array(image))
+        EDGE_IMAGES = 3  # the number of images in a row past the module's edge that must fail the check
+        hu_slices = set()
+        checked = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+
+            def check(image_numbers):
+                """Check the images not yet checked and return the HU linearity slices among them."""
+                to_check = [num for num in image_numbers if num not in checked and 0 <= num < self.num_images]
+                checked.update(to_check)
+                found = [num for num, is_hu in zip(to_check, executor.map(self._is_HU_slice, to_check)) if is_hu]
+                hu_slices.update(found)
+                return found
+
+            check(self._find_HU_slice_candidates())
+            if hu_slices:
+                check(range(min(hu_slices), max(hu_slices) + 1))
+                while check(range(min(hu_slices) - EDGE_IMAGES, min(hu_slices))):
+                    pass
+                while check(range(max(hu_slices) + 1, max(hu_slices) + 1 + EDGE_IMAGES)):
+                    pass
+            else:
+                check(range(self.num_images))
+
+        center_hu_slice = int(np.median(sorted(hu_slices)))
+        return center_hu_slice
+
+    def _find_HU_slice_candidates(self):
+        """Return the images whose pixels on a ring where the HU linearity ROIs are, around the phantom center of a
+        reference image, are near the criteria of :meth:`_is_HU_slice`."""
+        HU_MARGIN = 100  # the features of a ring around another image's center are only approximate
+        center = self._find_reference_phan_center()
+        if center is None:
+            return []
+        radius = 120/self.fov_ratio
+        angles = np.linspace(0, 2*np.pi, 360, endpoint=False)
+        radii = np.linspace(radius*0.95, radius*1.05, 5)
+        height, width = self.images.shape[:2]
+        x = np.clip(np.round(center.x + np.outer(radii, np.cos(angles))), 0, width - 1).astype(int).ravel()
+        y = np.clip(np.round(center.y + np.outer(radii, np.sin(angles))), 0, height - 1).astype(int).ravel()
+        ring = self.images[y, x, :]  # ring pixels x images
+        low, mid_low, mid_high, high = np.percentile(ring, (2, 30, 80, 98), axis=0)
+        is_candidate = (low < 800 + HU_MARGIN) & (high > 800 - HU_MARGIN) & (mid_high - mid_low < 40 + HU_MARGIN)
+        return list(np.flatnonzero(is_candidate))
+
+    def _find_reference_phan_center(self):
+        """Return the phantom center of one of the images whose area above the threshold is nearest the expected
+        phantom size, or None if the phantom isn't found in them."""
+        areas = (self.images > self.threshold).sum(axis=(0, 1))
+        for image_number in np.argsort(np.abs(areas - self.expected_phantom_size))[:5]:
+            slice = Slice(self, Image.from_array(self.images[:, :, image_number]))
             try:
                 slice.find_phan_center()
-            except ValueError:  # a slice without the phantom in view
+            except ValueError:
                 continue
-            else:
-                circle_prof = CollapsedCircleProfile(slice.phan_center, radius=120/self.fov_ratio)
-                circle_prof.get_profile(image, width_ratio=0.05, num_profiles=5)
-                prof = circle_prof.y_values
-                # determine if the profile contains both low and high values and that most values are the same
-                if (np.percentile(prof, 2) < 800) and (np.percentile(prof, 98) > 800) and (np.percentile(prof, 80) - np.percentile(prof, 30) < 40):
-                    hu_slices.append(image_number)
-
-        center_hu_slice = int(np.median(hu_slices))
-        return center_hu_slice
+            return slice.phan_center
+
+    def _is_HU_slice(self, image_number):
+        """Return whether an image is of the HU linearity module; see :meth:`_find_HU_slice`."""
+        image = self.images[:, :, image_number]
+        if not image.any():  # a blank slice, e.g. one not decoded by a targeted load
+            return False
+        slice = Slice(self, Image.from_array(image))
+        try:
+            slice.find_phan_center()
+        except ValueError:  # a slice without the phantom in view
+            return False
+        circle_prof = CollapsedCircleProfile(slice.phan_center, radius=120/self.fov_ratio)
+        circle_prof.get_profile(image, width_ratio=0.05, num_profiles=5)
+        prof = circle_prof.y_values
+        # determine if the profile contains both low and high values and that most values are the same
+        return (np.percentile(prof, 2) < 800) and (np.percentile(prof, 98) > 800) and (np.percentile(prof, 80) - np.percentile(prof, 30) < 40)
 
     @property
     def fov_ratio(self):
@@ -562,8 +759,7 @@ class Settings:
         if self._is_within_image_extent(slice):
             return slice
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def phantom_roll(self):
         """Lazy property returning the phantom roll in radians."""
         return self.calc_phantom_roll()
@@ -575,8 +771,7 @@ class Settings:
         HU = HU_Slice(self)
         return HU.determine_phantom_roll()
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def expected_phantom_size(self):
         """Determine the expected size of the phantom in pixels."""
         phan_area = np.pi*101**2  # Area = pi*r^2; slightly larger value used based on actual values acquired
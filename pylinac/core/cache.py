@@ -0,0 +1,402 @@
+"""An opt-in, persistent on-disk cache of analysis results.
+
+Once a cache directory is set with :func:`set_cache_dir`, analyses of the log analyzer, CBCT, picket fence, starshot,
+VMAT, and flatness/symmetry modules store their results there, keyed by a hash of their input data (file contents or
+image arrays), the analysis parameters, and the pylinac version. Analyzing the same data with the same parameters again,
+even in another process, then loads the results instead of recalculating them. The cache is bounded in total bytes;
+the least recently used entries are evicted first.
+
+Similarly, once a volume cache directory is set with :func:`set_volume_cache_dir`, the CBCT module stores the image
+volumes it loads there as .npy files, which are loaded memory-mapped when the same images are loaded again.
+
+.. versionadded:: 0.8.0
+"""
+import hashlib
+import json
+import os
+import os.path as osp
+import pickle
+import tempfile
+import warnings
+from functools import wraps
+from inspect import signature
+
+import numpy as np
+
+from pylinac import __version__
+
+DEFAULT_MAX_BYTES = 2**30  # 1GB
+DEFAULT_VOLUME_MAX_BYTES = 2**32  # 4GB
+
+_analysis_cache = None
+_volume_cache = None
+_file_hashes = {}  # file hashes, keyed by (path, size, modification time) so unchanged files aren't reread
+
+
+class AnalysisCache:
+    """A directory of pickled analysis results with least-recently-used eviction by total size.
+
+    Attributes
+    ----------
+    directory : str
+        The cache directory.
+    max_bytes : int
+        The maximum total size in bytes of the cache entries.
+    """
+    extension = '.pkl'
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Parameters
+        ----------
+        directory : str
+            The cache directory; created if it doesn't exist.
+        max_bytes : int
+            The maximum total size in bytes of the cache entries. The most recently stored entry is always kept.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return osp.join(self.directory, key + self.extension)
+
+    def get(self, key, shared=()):
+        """Return whether the key is in the cache and, if so, its value.
+
+        Parameters
+        ----------
+        key : str
+            The entry key; see :func:`make_key`.
+        shared : sequence
+            The objects that were passed as ``shared`` when the value was stored; references to them are restored.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                unpickler = pickle.Unpickler(f)
+                unpickler.persistent_load = lambda idx: shared[idx]
+                value = unpickler.load()
+        except FileNotFoundError:
+            return False, None
+        except Exception:  # an entry written by an incompatible version or truncated; drop it
+            self._remove_entry(path)
+            return False, None
+        # mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True, value
+
+    def set(self, key, value, shared=()):
+        """Store a value in the cache, then evict the least recently used entries beyond ``max_bytes``.
+
+        Parameters
+        ----------
+        key : str
+            The entry key; see :func:`make_key`.
+        value : object
+            The value to store; it must be picklable.
+        shared : sequence
+            Objects referenced by the value that shouldn't be stored, e.g. large input data. They're stored as
+            references and must be passed to :meth:`get` to restore the value.
+        """
+        shared_ids = {id(obj): idx for idx, obj in enumerate(shared)}
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickler.persistent_id = lambda obj: shared_ids.get(id(obj))
+                pickler.dump(value)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self._evict(keep=self._path(key))
+
+    def _entries(self):
+        """Return the (modification time, size, path) of the cache entries, oldest first."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.extension):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # removed by another process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def _evict(self, keep=None):
+        """Remove the least recently used entries until the cache is no more than max_bytes."""
+        entries = self._entries()
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            if path != keep:
+                self._remove_entry(path)
+                total_size -= size
+
+    def _remove_entry(self, path):
+        """Remove the entry at path."""
+        self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @property
+    def size(self):
+        """The total size in bytes of the cache entries."""
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        """Remove all the cache entries."""
+        for _, _, path in self._entries():
+            self._remove_entry(path)
+
+
+class VolumeCache(AnalysisCache):
+    """A directory of numpy volumes, each stored as a .npy file with a JSON metadata sidecar and loaded memory-mapped,
+    with least-recently-used eviction by total size.
+
+    Volumes are loaded read-only, so several processes can share one volume without copying it.
+    """
+    extension = '.npy'
+
+    def _metadata_path(self, path):
+        return path[:-len(self.extension)] + '.json'
+
+    def get(self, key):
+        """Return whether the key is in the cache and, if so, its memory-mapped volume and its metadata.
+
+        Parameters
+        ----------
+        key : str
+            The entry key; see :func:`make_key`.
+
+        Returns
+        -------
+        bool, (numpy.memmap, dict)
+        """
+        path = self._path(key)
+        try:
+            with open(self._metadata_path(path)) as f:
+                metadata = json.load(f)
+            volume = np.load(path, mmap_mode='r')
+        except FileNotFoundError:
+            return False, None
+        except Exception:  # a truncated entry; drop it
+            self._remove_entry(path)
+            return False, None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True, (volume, metadata)
+
+    def set(self, key, volume, metadata=None):
+        """Store a volume and its metadata in the cache, then evict the least recently used entries beyond
+        ``max_bytes``.
+
+        Parameters
+        ----------
+        key : str
+            The entry key; see :func:`make_key`.
+        volume : numpy.ndarray
+            The volume to store.
+        metadata : dict, None
+            Metadata of the volume; it must be JSON serializable.
+        """
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(metadata or {}, f)
+            os.replace(tmp_path, self._metadata_path(path))
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, volume)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self._evict(keep=path)
+
+    def _remove_entry(self, path):
+        """Remove the volume at path and its metadata."""
+        self._remove(path)
+        self._remove(self._metadata_path(path))
+
+
+def set_cache_dir(directory, max_bytes=DEFAULT_MAX_BYTES):
+    """Set the directory of the analysis cache, enabling it. Pass None to disable the cache.
+
+    Parameters
+    ----------
+    directory : str, None
+        The cache directory. Several processes may share it.
+    max_bytes : int
+        The maximum total size in bytes of the cache. Default is 1GB.
+    """
+    global _analysis_cache
+    if directory is None:
+        _analysis_cache = None
+    else:
+        _analysis_cache = AnalysisCache(directory, max_bytes)
+
+
+def get_cache():
+    """Return the :class:`AnalysisCache` in use, or None if caching is disabled."""
+    return _analysis_cache
+
+
+def set_volume_cache_dir(directory, max_bytes=DEFAULT_VOLUME_MAX_BYTES):
+    """Set the directory of the volume cache, enabling it. Pass None to disable the cache.
+
+    Parameters
+    ----------
+    directory : str, None
+        The cache directory. Several processes may share it.
+    max_bytes : int
+        The maximum total size in bytes of the cache. Default is 4GB.
+    """
+    global _volume_cache
+    if directory is None:
+        _volume_cache = None
+    else:
+        _volume_cache = VolumeCache(directory, max_bytes)
+
+
+def get_volume_cache():
+    """Return the :class:`VolumeCache` in use, or None if volume caching is disabled."""
+    return _volume_cache
+
+
+def content_hash(obj):
+    """Return a hex digest identifying the content of an object.
+
+    * Paths of existing files are hashed by their contents.
+    * File-like objects are hashed by their contents; their position is restored.
+    * Numpy arrays are hashed by their dtype, shape, and data.
+    * Objects with a ``_cache_inputs()`` method are hashed by what it returns.
+    * Tuples, lists, and dicts are hashed item by item. Anything else is hashed by its repr.
+    """
+    hasher = hashlib.sha1()
+    _update_hash(hasher, obj)
+    return hasher.hexdigest()
+
+
+def _update_hash(hasher, obj):
+    if hasattr(obj, '_cache_inputs'):
+        hasher.update(b'inputs')
+        _update_hash(hasher, obj._cache_inputs())
+    elif isinstance(obj, np.ndarray):
+        hasher.update(repr((obj.dtype.str, obj.shape)).encode())
+        hasher.update(np.ascontiguousarray(obj).data)
+    elif isinstance(obj, str) and osp.isfile(obj):
+        hasher.update(b'file')
+        hasher.update(_file_hash(obj).encode())
+    elif hasattr(obj, 'read') and hasattr(obj, 'seek'):
+        hasher.update(b'stream')
+        position = obj.tell()
+        obj.seek(0)
+        _hash_stream(hasher, obj)
+        obj.seek(position)
+    elif isinstance(obj, (tuple, list)):
+        hasher.update(b'(')
+        for item in obj:
+            _update_hash(hasher, item)
+            hasher.update(b',')
+        hasher.update(b')')
+    elif isinstance(obj, dict):
+        _update_hash(hasher, sorted(obj.items()))
+    else:
+        hasher.update(repr(obj).encode())
+
+
+def _hash_stream(hasher, stream):
+    """Update the hasher with the remaining contents of a file-like object."""
+    while True:
+        chunk = stream.read(2**20)
+        if not chunk:
+            break
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        hasher.update(chunk)
+
+
+def _file_hash(path):
+    """Return the hash of the contents of a file; unchanged files are hashed once per process."""
+    stat = os.stat(path)
+    file_key = (osp.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if file_key not in _file_hashes:
+        hasher = hashlib.sha1()
+        with open(path, 'rb') as f:
+            _hash_stream(hasher, f)
+        _file_hashes[file_key] = hasher.hexdigest()
+    return _file_hashes[file_key]
+
+
+def make_key(name, inputs):
+    """Return the cache key of an analysis: a hash of its name, its inputs and parameters, and the pylinac version."""
+    return content_hash((__version__, name, inputs))
+
+
+def cached_analysis(state=False, shared=None, ignore=()):
+    """Decorator to store the result of an analysis function or method in the analysis cache, if one is set.
+
+    The key is made from the function name and its arguments (see :func:`content_hash`), so the instance of a
+    method must define ``_cache_inputs()``, returning the data the analysis depends on, or None if it can't be cached.
+
+    .. versionadded:: 0.8.0
+
+    Parameters
+    ----------
+    state : bool
+        If False (default), the return value is cached.
+        If True, the method is an analysis that sets attributes; the attributes of the instance after the analysis
+        are cached as well and restored when the result is loaded.
+    shared : callable, None
+        A function of the instance returning a sequence of objects referenced by the attributes that shouldn't be
+        stored, e.g. a large image volume that the analysis doesn't change.
+    ignore : sequence of str
+        The names of arguments left out of the key because they don't change the results, e.g. a number of workers.
+    """
+    def decorate(func):
+        sig = signature(func)
+        name = func.__module__ + '.' + func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if cache is None:
+                return func(*args, **kwargs)
+            bound_args = sig.bind(*args, **kwargs)
+            bound_args.apply_defaults()
+            inputs = [(arg, value) for arg, value in bound_args.arguments.items() if arg not in ignore]
+            if any(hasattr(value, '_cache_inputs') and value._cache_inputs() is None for _, value in inputs):
+                return func(*args, **kwargs)
+            key = make_key(name, inputs)
+            instance = args[0] if args else None
+            shared_objs = tuple(shared(instance)) if shared is not None else ()
+
+            found, entry = cache.get(key, shared_objs)
+            if found:
+                result, attrs = entry
+                if state:
+                    instance.__dict__.update(attrs)
+                return result
+
+            result = func(*args, **kwargs)
+            try:
+                cache.set(key, (result, dict(vars(instance)) if state else None), shared_objs)
+            except (pickle.PicklingError, TypeError, AttributeError, OSError) as e:
+                warnings.warn("The results of {} could not be cached: {}".format(name, e))
+            return result
+        return wrapper
+    return decorate
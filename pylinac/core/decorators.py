@@ -2,10 +2,14 @@
 # The following is adapted from: http://code.activestate.com/recipes/578809-decorator-to-check-method-param-types/
 # Another type checking decorator: http://code.activestate.com/recipes/454322-type-checking-decorator/
 from abc import ABCMeta
-from functools import wraps
+from collections import OrderedDict
+from functools import wraps, update_wrapper
 from inspect import signature
+import sys
 import time
 
+import numpy as np
+
 
 def timethis(func):
     """Report execution time of function."""
@@ -110,4 +114,128 @@ def unwrap_func(wrapped_func, unwraps=0):
             except AttributeError:
                 break
 
-    return func
\ No newline at end of file
+    return func
+
+class lazyproperty:
+    """Decorator for a property that's computed on first access and then stored on the instance.
+
+    Unlike a property cached with ``functools.lru_cache``, the value lives and dies with its instance rather than
+    in a process-wide cache that keeps the instance alive. Use :func:`clear_caches` to invalidate it.
+
+    .. versionadded:: 0.8.0
+    """
+    def __init__(self, func):
+        self.func = func
+        update_wrapper(self, func)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = self.func(instance)
+        # the instance attribute shadows this (non-data) descriptor from now on
+        instance.__dict__[self.__name__] = value
+        return value
+
+def instance_cache(maxsize=16, maxbytes=None):
+    """Decorator to memoize a method per instance.
+
+    Results are stored on the instance rather than in a process-wide cache like ``functools.lru_cache``, so they are
+    freed with the instance. Arguments are bound to the method signature, so default and explicit values share an entry.
+    The least-recently-used entries are evicted when there are more than ``maxsize`` entries or they hold more than
+    ``maxbytes`` bytes of arrays; the most recent entry is always kept. Both limits can be changed at runtime on the
+    class attribute, e.g. ``Class.method.maxbytes = 2**20``. The bound method has ``cache_clear()`` and
+    ``cache_info()`` methods; :func:`clear_caches` clears all the caches of an instance.
+
+    .. versionadded:: 0.8.0
+
+    Parameters
+    ----------
+    maxsize : int, None
+        The maximum number of results to keep per instance. If None, the number is unbounded.
+    maxbytes : int, None
+        The maximum number of bytes of results to keep per instance. If None, the size is unbounded.
+    """
+    def decorate(func):
+        return _InstanceCache(func, maxsize, maxbytes)
+    return decorate
+
+class _InstanceCache:
+    """Descriptor of a method memoized per instance; see :func:`instance_cache`."""
+    def __init__(self, func, maxsize, maxbytes):
+        self.func = func
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.signature = signature(func)
+        self.cache_name = '_cache_' + func.__name__
+        update_wrapper(self, func)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return _BoundInstanceCache(self, instance)
+
+    def cache(self, instance):
+        """Return the (results, sizes) dictionaries of an instance, creating them on first use."""
+        try:
+            return instance.__dict__[self.cache_name]
+        except KeyError:
+            return instance.__dict__.setdefault(self.cache_name, (OrderedDict(), {}))
+
+    def call(self, instance, args, kwargs):
+        bound_args = self.signature.bind(instance, *args, **kwargs)
+        bound_args.apply_defaults()
+        key = tuple(bound_args.arguments.values())[1:]
+        results, sizes = self.cache(instance)
+        if key in results:
+            results.move_to_end(key)
+            return results[key]
+        result = self.func(instance, *args, **kwargs)
+        results[key] = result
+        sizes[key] = _nbytes(result)
+        while len(results) > 1 and ((self.maxsize is not None and len(results) > self.maxsize) or
+                                    (self.maxbytes is not None and sum(sizes.values()) > self.maxbytes)):
+            oldest_key, _ = results.popitem(last=False)
+            del sizes[oldest_key]
+        return result
+
+class _BoundInstanceCache:
+    """A memoized method bound to an instance."""
+    def __init__(self, method, instance):
+        self._method = method
+        self._instance = instance
+        update_wrapper(self, method.func)
+
+    def __call__(self, *args, **kwargs):
+        return self._method.call(self._instance, args, kwargs)
+
+    def cache_info(self):
+        """Return the number of results cached for the instance and their size in bytes."""
+        results, sizes = self._method.cache(self._instance)
+        return len(results), sum(sizes.values())
+
+    def cache_clear(self):
+        """Clear the results cached for the instance."""
+        self._instance.__dict__.pop(self._method.cache_name, None)
+
+def clear_caches(obj):
+    """Clear the :class:`lazyproperty` values and :func:`instance_cache` results stored on an object.
+
+    .. versionadded:: 0.8.0
+    """
+    for cls in type(obj).__mro__:
+        for name, attr in vars(cls).items():
+            if isinstance(attr, lazyproperty):
+                obj.__dict__.pop(name, None)
+            elif isinstance(attr, _InstanceCache):
+                obj.__dict__.pop(attr.cache_name, None)
+
+def _nbytes(obj):
+    """Return the approximate size in bytes of a cached result, counting the data of arrays."""
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    elif isinstance(obj, (tuple, list)):
+        return sum(_nbytes(item) for item in obj)
+    elif obj is None:
+        return 0
+    else:
+        return sys.getsizeof(obj)
@@ -359,8 +359,16 @@ class Image:
         init_obj.array = combined_arr
         return init_obj
 
+    def _cache_inputs(self):
+        """The data analyses of the image depend on; see :mod:`~pylinac.core.cache`."""
+        return self.array, self.dpmm, self.SID
+
     def __getattr__(self, item):
         """Set the Attribute getter to grab from the array if possible (for things like .shape, .size, etc)."""
+        # nothing is forwarded until the array is set; otherwise looking up the array itself would recurse,
+        # e.g. when an image is unpickled
+        if '_array' not in self.__dict__:
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, item))
         return getattr(self.array, item)
 
 if __name__ == '__main__':
@@ -6,6 +6,7 @@ import matplotlib.pyplot as plt
 
 from pylinac.core.image import Image
 from pylinac.core.decorators import type_accept
+from pylinac.core.cache import cached_analysis
 from pylinac.core.io import is_valid_file
 from pylinac.core.profile import SingleProfile
 from pylinac.core.utilities import is_iterable, isnumeric
@@ -141,6 +142,7 @@ class BeamImage(Image):
         plt.tight_layout()
         plt.show()
 
+    @cached_analysis()
     def symmetry(self, plane='both', position='auto', method='varian'):
         """Determine and return the symmetry of the image.
 
@@ -329,6 +331,7 @@ class BeamImage(Image):
             prof = SingleProfile(self.array[:, position[0]])
         return prof
 
+    @cached_analysis()
     def flatness(self, plane='crossplane', position='auto', method='varian'):
         """Determine the flatness of the image.
 
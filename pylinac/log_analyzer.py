@@ -7,21 +7,32 @@ Unlike most other modules of pylinac, the log analyzer module has no end goal. D
 info, and which info is analyzed is up to the user.
 """
 from abc import ABCMeta, abstractproperty
+import binascii
 import struct
+import mmap
 import os
 import os.path as osp
 import csv
-import copy
+import shutil
+import tempfile
+import threading
+import time
 import warnings
+import weakref
+import zipfile
+from collections import OrderedDict
+from collections.abc import Mapping
 from io import BytesIO, StringIO
-from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import numpy as np
 import scipy.ndimage.filters as spf
+from scipy.spatial import cKDTree
 import matplotlib.pyplot as plt
 
 from pylinac import MEMORY_PROFILE, DEBUG
-from pylinac.core.decorators import type_accept, value_accept
+from pylinac.core.decorators import type_accept, value_accept, lazyproperty, instance_cache, clear_caches
+from pylinac.core.cache import cached_analysis
 from pylinac.core.io import is_valid_file, is_valid_dir, get_folder_UI, get_filepath_UI, open_file
 from pylinac.core.utilities import is_iterable
 
@@ -32,6 +43,19 @@ if DEBUG and MEMORY_PROFILE:
 np.seterr(invalid='ignore')  # ignore warnings for invalid numpy operations. Used for np.where() operations on partially-NaN arrays.
 
 log_types = {'dlog': 'Dynalog', 'tlog': 'Trajectory log'}
+fluence_methods = {'vectorized': 'vectorized', 'loop': 'loop'}
+gamma_methods = {'bakai': 'bakai', 'search': 'search'}
+DLOG_HEADER_ROWS = 6  # the number of header lines preceding the snapshot data in a dynalog
+TLOG_HEADER_SIZE = 1024  # the size in bytes of the header section of a trajectory log
+# the per-log summary of a batch analysis; see MachineLogs.analyze()
+log_results_dtype = [('avg_gamma', float), ('gamma_pass_pct', float), ('rms_avg', float),
+                     ('rms_max', float), ('num_beamholds', int)]
+# the axes written by columnar exports as (column name, attribute path of the axis data); see write_columnar()
+columnar_axes = (('gantry', ('gantry',)), ('collimator', ('collimator',)),
+                 ('jaw_x1', ('jaws', 'x1')), ('jaw_x2', ('jaws', 'x2')), ('jaw_y1', ('jaws', 'y1')), ('jaw_y2', ('jaws', 'y2')),
+                 ('couch_vert', ('couch', 'vert')), ('couch_lng', ('couch', 'long')), ('couch_lat', ('couch', 'latl')),
+                 ('couch_rtn', ('couch', 'rotn')), ('mu', ('mu',)), ('beam_hold', ('beam_hold',)),
+                 ('control_point', ('control_point',)), ('carriage_A', ('carriage_A',)), ('carriage_B', ('carriage_B',)))
 
 
 class MachineLogs(list):
@@ -40,7 +64,7 @@ class MachineLogs(list):
 
     Read in machine logs from a directory. Inherits from list. Batch methods are also provided."""
     @type_accept(folder=str)
-    def __init__(self, folder=None, recursive=True, verbose=True):
+    def __init__(self, folder=None, recursive=True, verbose=True, header_only=False, dtype=None):
         """
         Parameters
         ----------
@@ -51,6 +75,14 @@ class MachineLogs(list):
             Whether to walk through subfolders of passed directory. Only used if ``dir`` is a valid log directory.
         verbose : bool
             If True (default), prints load status at each log. Only used if ``dir`` is a valid log directory.
+        header_only : bool
+            If True, only the log headers are read upon loading; see :class:`~pylinac.log_analyzer.MachineLog`.
+
+            .. versionadded:: 0.8.0
+        dtype : numpy.dtype, None
+            The precision of the logs' data; see :class:`~pylinac.log_analyzer.MachineLog`.
+
+            .. versionadded:: 0.8.0
 
         Examples
         --------
@@ -74,10 +106,18 @@ class MachineLogs(list):
             >>> 0.05 # or whatever it is
             >>> logs.avg_gamma_pct()
             >>> 97.2
+
+        Large batches can be analyzed in parallel; the aggregate methods then read from the results::
+
+            >>> results = logs.analyze(workers=4)
+            >>> results['rms_max']
         """
         super().__init__()
+        self._results = None
+        self._results_params = None
+        self._results_logs = ()
         if folder is not None and is_valid_dir(folder):
-            self.load_folder(folder, recursive, verbose)
+            self.load_folder(folder, recursive, verbose, header_only, dtype)
 
     @property
     def num_logs(self):
@@ -102,7 +142,7 @@ class MachineLogs(list):
         """Return the number of Trajectory logs currently loaded."""
         return self._num_log_type(log_types['dlog'])
 
-    def load_folder(self, dir, recursive=True, verbose=True):
+    def load_folder(self, dir, recursive=True, verbose=True, header_only=False, dtype=None):
         """Load log files from a directory.
 
         Parameters
@@ -117,32 +157,91 @@ class MachineLogs(list):
             If False, will only search root directory.
         verbose : bool
             If True (default), prints load status at each log.
+        header_only : bool
+            If True, only the log headers are read upon loading; see :class:`~pylinac.log_analyzer.MachineLog`.
+
+            .. versionadded:: 0.8.0
+        dtype : numpy.dtype, None
+            The precision of the logs' data; see :class:`~pylinac.log_analyzer.MachineLog`.
+
+            .. versionadded:: 0.8.0
         """
-        # do initial walk to get file count
-        num_logs = 0
-        num_skipped = 0
-        for root, dirs, files in os.walk(dir):
-            _, num_logs, num_skipped = self._clean_log_filenames(files, root, num_logs, num_skipped)
-            if not recursive:
-                break
-        if num_logs == 0:
+        scanner = LogScanner(dir, recursive)
+        if verbose:
+            print("Log loaded:")
+        # logs are loaded as the scan finds them rather than after the whole directory has been walked
+        for load_num, (pth, _) in enumerate(scanner, start=1):
+            super().append(MachineLog(pth, header_only=header_only, dtype=dtype))
+            if verbose:
+                print(load_num)
+        if scanner.num_logs == 0:
             warnings.warn("No logs found.")
-            return
+        elif verbose:
+            print("{} logs found. \n{} logs skipped.".format(scanner.num_logs, scanner.num_skipped))
 
-        # actual log loading
-        load_num = 1
-        if verbose:
-            print("{} logs found. \n{} logs skipped. \nLog loaded:".format(num_logs, num_skipped))
-        for root, dirs, files in os.walk(dir):
-            cleaned_files, _, _ = self._clean_log_filenames(files, root, num_logs, num_skipped)
-            for name in cleaned_files:
-                pth = osp.join(root, name)
-                self.append(pth)
-                if verbose:
-                    print("{} of {}".format(load_num, num_logs))
-                    load_num += 1
-            if not recursive:
-                break  # break out of for loop after top level search
+    @staticmethod
+    def iter_folder(folder, recursive=True, exclude_beam_off=True, header_only=False, dtype=None):
+        """Yield the logs of a directory one at a time, loading each as it is found.
+
+        Unlike loading a folder, the logs are not retained, so memory is bounded by a single log no
+        matter how large the directory is.
+
+        .. versionadded:: 0.8.0
+
+        Parameters
+        ----------
+        folder : str
+            The directory of interest.
+        recursive : bool
+            If True (default), will walk through subfolders of passed directory.
+        exclude_beam_off : bool
+            See :class:`~pylinac.log_analyzer.MachineLog`.
+        header_only : bool
+            See :class:`~pylinac.log_analyzer.MachineLog`.
+        dtype : numpy.dtype, None
+            See :class:`~pylinac.log_analyzer.MachineLog`.
+
+        Yields
+        ------
+        :class:`~pylinac.log_analyzer.MachineLog`
+        """
+        for pth, _ in LogScanner(folder, recursive):
+            yield MachineLog(pth, exclude_beam_off, header_only, dtype)
+
+    @classmethod
+    def summarize_folder(cls, folder, doseTA=1, distTA=1, threshold=10, resolution=0.1, recursive=True, verbose=True,
+                         dtype=None):
+        """Summarize the logs of a directory one log at a time without retaining them.
+
+        Each log is loaded, analyzed, and added to a :class:`~pylinac.log_analyzer.LogSummary`; its data is then
+        released before the next log is loaded. Use this for directories too large to hold in memory at once.
+
+        .. versionadded:: 0.8.0
+
+        Parameters
+        ----------
+        folder : str
+            The directory of interest.
+        doseTA, distTA, threshold, resolution
+            See :meth:`~pylinac.log_analyzer.GammaFluence.calc_map()`.
+        recursive : bool
+            If True (default), will walk through subfolders of passed directory.
+        verbose : bool
+            If True (default), prints the status at each log.
+        dtype : numpy.dtype, None
+            The precision of the logs' data; see :class:`~pylinac.log_analyzer.MachineLog`.
+
+        Returns
+        -------
+        :class:`~pylinac.log_analyzer.LogSummary`
+        """
+        summary = LogSummary(doseTA, distTA, threshold, resolution)
+        # logs are loaded header-only; the axis data is only read if the results aren't in the analysis cache
+        for log in cls.iter_folder(folder, recursive, header_only=True, dtype=dtype):
+            summary.add(log)
+            if verbose:
+                print("{} summarized".format(summary.num_logs))
+        return summary
 
     @classmethod
     def from_folder_UI(cls, recursive=True, verbose=True):
@@ -160,26 +259,6 @@ class MachineLogs(list):
         if folder:
             self.load_folder(folder, recursive, verbose)
 
-    def _clean_log_filenames(self, filenames, root, num_logs, num_skipped):
-        """Extract the names of real log files from a list of files."""
-        cleaned_filenames = []
-        for idx, filename in enumerate(filenames):
-            filename = osp.join(root, filename)
-            if is_tlog(filename):
-                num_logs += 1
-                cleaned_filenames.append(filename)
-            elif is_dlog(filename):
-                opp_file = _return_other_dlg(filename, raise_find_error=False)
-                if opp_file is not None:
-                    num_logs += 1
-                    opp_file = osp.basename(opp_file)
-                    del filenames[filenames.index(opp_file)]
-                    cleaned_filenames.append(filename)
-                else:
-                    num_skipped += 1
-                    del filenames[idx]
-        return cleaned_filenames, num_logs, num_skipped
-
     def _check_empty(self):
         """Check if any logs have been loaded."""
         if len(self) == 0:
@@ -196,7 +275,7 @@ class MachineLogs(list):
         print("Average gamma: {:3.2f}".format(self.avg_gamma(verbose=False)))
         print("Average gamma pass percent: {:3.1f}".format(self.avg_gamma_pct(verbose=False)))
 
-    def append(self, obj, recursive=True):
+    def append(self, obj, recursive=True, header_only=False, dtype=None):
         """Append a log. Overloads list method.
 
         Parameters
@@ -207,48 +286,116 @@ class MachineLogs(list):
             If a MachineLog, then simply appends.
         recursive : bool
             Whether to walk through subfolders of passed directory. Only applicable if obj was a directory.
+        header_only : bool
+            If True, only the log header is read upon loading. Only applicable if obj was a string.
+
+            .. versionadded:: 0.8.0
+        dtype : numpy.dtype, None
+            The precision of the log data; see :class:`~pylinac.log_analyzer.MachineLog`. Only applicable if obj was
+            a string.
+
+            .. versionadded:: 0.8.0
         """
         if isinstance(obj, str):
             if is_log(obj):
-                log = MachineLog(obj)
+                log = MachineLog(obj, header_only=header_only, dtype=dtype)
                 super().append(log)
             elif is_valid_dir(obj, raise_error=False):
-                for root, dirs, files in os.walk(obj):
-                    for name in files:
-                        pth = osp.join(root, name)
-                        self.append(pth)
+                for pth, _ in LogScanner(obj, recursive):
+                    super().append(MachineLog(pth, header_only=header_only, dtype=dtype))
         elif isinstance(obj, MachineLog):
             super().append(obj)
         else:
             raise TypeError("Can only append MachineLog or string pointing to a log or log directory.")
 
+    def analyze(self, doseTA=1, distTA=1, threshold=10, resolution=0.1, workers=1, verbose=True):
+        """Calculate the fluence, gamma, and MLC metrics of all the logs and store a per-log summary.
+
+        The aggregate methods (e.g. :meth:`avg_gamma`) read from this summary rather than recalculating.
+
+        .. versionadded:: 0.8.0
+
+        Parameters
+        ----------
+        doseTA, distTA, threshold, resolution
+            See :meth:`~pylinac.log_analyzer.GammaFluence.calc_map()`.
+        workers : int
+            The number of processes to analyze the logs with. If 1 (default), logs are analyzed in this process.
+            If >1, each log is reloaded from its file and analyzed in a process pool. Logs loaded from a stream
+            (e.g. from a URL) are always analyzed in this process.
+
+            .. note:: On Windows, the calling script must be guarded by ``if __name__ == '__main__':`` to use a pool.
+
+        verbose : bool
+            If True (default), prints the analysis status at each log.
+
+        Returns
+        -------
+        numpy.ndarray
+            A structured array with one row per log, in the same order as the logs, and the fields
+            'avg_gamma', 'gamma_pass_pct', 'rms_avg', 'rms_max', and 'num_beamholds'.
+        """
+        self._check_empty()
+        gamma_params = (doseTA, distTA, threshold, resolution)
+        results = np.zeros(self.num_logs, dtype=log_results_dtype)
+        if verbose:
+            print("Analyzing logs:")
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {}
+                for num, log in enumerate(self):
+                    if isinstance(log.filename, str):
+                        future = executor.submit(_analyze_log_file, log.filename, log._exclude_beam_off, log._dtype,
+                                                 gamma_params)
+                        futures[future] = num
+                    else:
+                        results[num] = _analyze_log(log, *gamma_params)
+                for load_num, future in enumerate(as_completed(futures), start=1):
+                    results[futures[future]] = future.result()
+                    if verbose:
+                        print("{} of {}".format(load_num, len(futures)))
+        else:
+            for num, log in enumerate(self):
+                results[num] = _analyze_log(log, *gamma_params)
+                if verbose:
+                    print("{} of {}".format(num+1, self.num_logs))
+
+        self._results = results
+        self._results_params = gamma_params
+        self._results_logs = tuple(weakref.ref(log) for log in self)  # weak, so the summary doesn't keep logs alive
+        return results
+
+    @property
+    def results(self):
+        """The per-log summary of the last :meth:`analyze` call.
+
+        .. versionadded:: 0.8.0
+        """
+        if self._results is None:
+            raise AttributeError("Logs have not been analyzed yet; use analyze()")
+        return self._results
+
+    def _get_results(self, doseTA, distTA, threshold, resolution, verbose):
+        """Return the per-log summary, analyzing the logs only if the logs or the gamma parameters changed."""
+        self._check_empty()
+        gamma_params = (doseTA, distTA, threshold, resolution)
+        logs_changed = (len(self._results_logs) != self.num_logs or
+                        any(log_ref() is not log for log_ref, log in zip(self._results_logs, self)))
+        if self._results is None or logs_changed or self._results_params != gamma_params:
+            self.analyze(doseTA, distTA, threshold, resolution, verbose=verbose)
+        return self._results
+
     def avg_gamma(self, doseTA=1, distTA=1, threshold=10, resolution=0.1, verbose=True):
         """Calculate and return the average gamma of all logs. See :meth:`~pylinac.log_analyzer.GammaFluence.calc_map()`
         for further parameter info."""
-        self._check_empty()
-        gamma_list = np.zeros(self.num_logs)
-        if verbose:
-            print("Calculating gammas:")
-        for num, log in enumerate(self):
-            log.fluence.gamma.calc_map(doseTA, distTA, threshold, resolution)
-            gamma_list[num] = log.fluence.gamma.avg_gamma
-            if verbose:
-                print('{} of {}'.format(num+1, self.num_logs))
-        return gamma_list.mean()
+        results = self._get_results(doseTA, distTA, threshold, resolution, verbose)
+        return results['avg_gamma'].mean()
 
     def avg_gamma_pct(self, doseTA=1, distTA=1, threshold=10, resolution=0.1, verbose=True):
         """Calculate and return the average gamma pass percent of all logs. See :meth:`~pylinac.log_analyzer.GammaFluence.calc_map()`
         for further parameter info."""
-        self._check_empty()
-        gamma_list = np.zeros(self.num_logs)
-        if verbose:
-            print("Calculating gamma pass percent:")
-        for num, log in enumerate(self):
-            log.fluence.gamma.calc_map(doseTA, distTA, threshold, resolution)
-            gamma_list[num] = log.fluence.gamma.pass_prcnt
-            if verbose:
-                print("{} of {}".format(num+1, self.num_logs))
-        return gamma_list.mean()
+        results = self._get_results(doseTA, distTA, threshold, resolution, verbose)
+        return results['gamma_pass_pct'].mean()
 
     def to_csv(self):
         """Write trajectory logs to CSV. If there are both dynalogs and trajectory logs,
@@ -263,13 +410,340 @@ class MachineLogs(list):
         else:
             print('\n\nNo files written')
 
+    def to_columnar(self, filename):
+        """Write the axis and leaf data of all the logs, both Trajectory logs and dynalogs, to a single columnar file.
+        See :func:`~pylinac.log_analyzer.write_columnar`.
+
+        .. versionadded:: 0.8.0
+        """
+        self._check_empty()
+        write_columnar(self, filename)
+
+
+class LogSummary:
+    """Accumulates the summary of logs one log at a time so that the logs themselves needn't be retained.
+
+    .. versionadded:: 0.8.0
+
+    Attributes
+    ----------
+    filenames : list
+        The filenames of the logs added, in order.
+
+    Examples
+    --------
+    >>> summary = LogSummary()
+    >>> for log in MachineLogs.iter_folder(r'C:\path\log\directory'):
+    ...     summary.add(log)
+    >>> summary.avg_gamma
+    """
+    def __init__(self, doseTA=1, distTA=1, threshold=10, resolution=0.1):
+        """
+        Parameters
+        ----------
+        doseTA, distTA, threshold, resolution
+            The gamma parameters each log is analyzed with;
+            see :meth:`~pylinac.log_analyzer.GammaFluence.calc_map()`.
+        """
+        self._gamma_params = (doseTA, distTA, threshold, resolution)
+        self._rows = []
+        self.filenames = []
+
+    def add(self, log):
+        """Analyze a log and add its summary.
+
+        Parameters
+        ----------
+        log : :class:`~pylinac.log_analyzer.MachineLog`
+        """
+        self._rows.append(_analyze_log(log, *self._gamma_params))
+        self.filenames.append(log.filename)
+
+    @property
+    def num_logs(self):
+        """Return the number of logs summarized."""
+        return len(self._rows)
+
+    @property
+    def results(self):
+        """A structured array of the per-log summaries; see :meth:`~pylinac.log_analyzer.MachineLogs.analyze()`."""
+        if not self._rows:
+            raise ValueError("No logs have been summarized yet.")
+        return np.array(self._rows, dtype=log_results_dtype)
+
+    @property
+    def avg_gamma(self):
+        """Return the average gamma of all the logs."""
+        return self.results['avg_gamma'].mean()
+
+    @property
+    def avg_gamma_pct(self):
+        """Return the average gamma pass percent of all the logs."""
+        return self.results['gamma_pass_pct'].mean()
+
+    @property
+    def avg_RMS(self):
+        """Return the average of the logs' average MLC RMS."""
+        return self.results['rms_avg'].mean()
+
+    @property
+    def max_RMS(self):
+        """Return the maximum MLC RMS of all the logs."""
+        return self.results['rms_max'].max()
+
+    @property
+    def num_beamholds(self):
+        """Return the total number of beam holds of all the logs."""
+        return int(self.results['num_beamholds'].sum())
+
+
+class LogScanner:
+    """Scans a directory for machine logs in a single pass.
+
+    .. versionadded:: 0.8.0
+
+    Iterating over the scanner yields a ``(path, log_type)`` tuple for each log as it is found, so loading can
+    begin before the scan finishes. Each file is sniffed for its log type exactly once. Dynalogs are yielded
+    once per A/B pair, as the path to the A-file, when both files have been found in the same directory;
+    dynalogs without a match or without an A/B name are skipped.
+
+    Attributes
+    ----------
+    num_logs : int
+        The number of logs yielded so far.
+    num_skipped : int
+        The number of dynalog files skipped so far.
+
+    Examples
+    --------
+    >>> for path, log_type in LogScanner(r'C:\path\log\directory'):
+    ...     print(path, log_type)
+    """
+    def __init__(self, folder, recursive=True):
+        """
+        Parameters
+        ----------
+        folder : str
+            The directory to scan.
+        recursive : bool
+            If True (default), subfolders are scanned too.
+        """
+        self.folder = folder
+        self.recursive = recursive
+        self.num_logs = 0
+        self.num_skipped = 0
+
+    def __iter__(self):
+        folders = [self.folder]
+        while folders:
+            unpaired_dlogs = {}  # keyed by the filename after the A/B prefix
+            subfolders = []
+            for entry in sorted(os.scandir(folders.pop(0)), key=lambda entry: entry.name):
+                if entry.is_dir():
+                    subfolders.append(entry.path)
+                    continue
+                elif not entry.is_file():
+                    continue
+                log_type = sniff_log_type(entry.path)
+                if log_type == log_types['tlog']:
+                    self.num_logs += 1
+                    yield entry.path, log_type
+                elif log_type == log_types['dlog']:
+                    bank, suffix = entry.name[0], entry.name[1:]
+                    if bank not in ('A', 'B'):
+                        self.num_skipped += 1
+                    elif suffix in unpaired_dlogs:
+                        other_path = unpaired_dlogs.pop(suffix)
+                        self.num_logs += 1
+                        yield (entry.path if bank == 'A' else other_path), log_type
+                    else:
+                        unpaired_dlogs[suffix] = entry.path
+            self.num_skipped += len(unpaired_dlogs)
+            if self.recursive:
+                folders = subfolders + folders
+
+
+class LogWatcher:
+    """Watches a directory for new machine logs and summarizes each as soon as it is completely written.
+
+    The directory is polled; no OS-specific file notification services are used. A log is analyzed once its files
+    have kept the same size and modification time for a whole polling interval and, for trajectory logs, the file
+    holds all the snapshots its header declares (``num_snapshots``). Dynalogs are analyzed once both their A- and
+    B-files are stable. A log that can't be analyzed yet is retried when its files change. The summary of each log is
+    passed to the callback and/or put on the queue as a dict of its filename, log type, and the fields of
+    :data:`log_results_dtype` (average gamma, gamma pass percent, average and maximum RMS, and beam holds).
+
+    .. versionadded:: 0.8.0
+
+    Attributes
+    ----------
+    num_logs : int
+        The number of logs summarized so far.
+
+    Examples
+    --------
+    >>> watcher = LogWatcher(r'C:\path\log\directory', callback=print)
+    >>> watcher.start()  # the summary of each new log is printed in a background thread
+    >>> watcher.stop()
+    """
+    def __init__(self, folder, callback=None, queue=None, interval=2, recursive=True, include_existing=False,
+                 exclude_beam_off=True, doseTA=1, distTA=1, threshold=10, resolution=0.1):
+        """
+        Parameters
+        ----------
+        folder : str
+            The directory to watch.
+        callback : callable, None
+            Called with the summary dict of each log.
+        queue : queue.Queue, None
+            A queue (or any object with a ``put`` method) the summary dict of each log is put on.
+        interval : int, float
+            The polling interval in seconds; a file must be unchanged for one interval to be considered complete.
+        recursive : bool
+            If True (default), subfolders are watched too.
+        include_existing : bool
+            If False (default), only logs written after the watcher is created are summarized.
+            If True, the logs already in the directory are summarized as well.
+        exclude_beam_off : bool
+            See :class:`~pylinac.log_analyzer.MachineLog`.
+        doseTA, distTA, threshold, resolution
+            The gamma parameters each log is analyzed with;
+            see :meth:`~pylinac.log_analyzer.GammaFluence.calc_map()`.
+        """
+        if not osp.isdir(folder):
+            raise NotADirectoryError("{} is not a directory".format(folder))
+        self.folder = folder
+        self.callback = callback
+        self.queue = queue
+        self.interval = interval
+        self.recursive = recursive
+        self.exclude_beam_off = exclude_beam_off
+        self.num_logs = 0
+        self._gamma_params = (doseTA, distTA, threshold, resolution)
+        self._previous = {}  # the (size, modification time) of each file at the previous poll
+        self._attempted = {}  # the file states of each log when it was last analyzed, keyed by its path
+        self._log_types = {}  # the (state, log type) of each file, so unchanged files aren't sniffed again
+        self._stop_event = threading.Event()
+        self._thread = None
+        if not include_existing:
+            current = self._scan()
+            self._previous = current
+            for path in current:
+                log_unit = self._log_unit(path, current)
+                if log_unit is not None:
+                    self._attempted[log_unit[0]] = log_unit[2]
+
+    def poll(self):
+        """Check the directory once and summarize the logs that have become complete.
+
+        Returns
+        -------
+        list
+            The summary dicts of the logs summarized by this poll.
+        """
+        current = self._scan()
+        stable = {path: state for path, state in current.items() if self._previous.get(path) == state}
+        self._previous = current
+        summaries = []
+        for path in sorted(stable):
+            log_unit = self._log_unit(path, stable)
+            if log_unit is None:
+                continue
+            log_path, log_type, state = log_unit
+            if self._attempted.get(log_path) == state:
+                continue
+            self._attempted[log_path] = state
+            summary = self._summarize(log_path, log_type)
+            if summary is not None:
+                summaries.append(summary)
+        return summaries
+
+    def watch(self, timeout=None):
+        """Poll the directory every interval until :meth:`stop` is called or the timeout in seconds passes."""
+        start = time.time()
+        self._stop_event.clear()
+        while not self._stop_event.is_set():
+            self.poll()
+            if timeout is not None and time.time() - start >= timeout:
+                break
+            self._stop_event.wait(self.interval)
+
+    def start(self):
+        """Watch the directory in a background thread; see :meth:`watch`."""
+        if self._thread is not None and self._thread.is_alive():
+            raise ValueError("The watcher is already running")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.watch, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the directory, waiting for the current poll to finish."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _scan(self):
+        """Return the (size, modification time) of each file of the directory, keyed by path."""
+        states = {}
+        folders = [self.folder]
+        while folders:
+            for entry in os.scandir(folders.pop()):
+                try:
+                    if entry.is_dir():
+                        if self.recursive:
+                            folders.append(entry.path)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        states[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                except FileNotFoundError:  # removed while scanning
+                    continue
+        return states
+
+    def _log_unit(self, path, states):
+        """Return the (log path, log type, state of its files) of the log a file belongs to, or None if the file
+        isn't a log or the other file of its dynalog pair isn't among the states. Dynalogs are keyed by the A-file."""
+        state = states[path]
+        cached_state, log_type = self._log_types.get(path, (None, None))
+        if cached_state != state:
+            log_type = sniff_log_type(path) if state[0] > 0 else None
+            self._log_types[path] = (state, log_type)
+        if log_type == log_types['tlog']:
+            return path, log_type, (state,)
+        elif log_type == log_types['dlog']:
+            folder, name = osp.split(path)
+            if name[0] not in ('A', 'B'):
+                return
+            a_path, b_path = osp.join(folder, 'A' + name[1:]), osp.join(folder, 'B' + name[1:])
+            if a_path in states and b_path in states:
+                return a_path, log_type, (states[a_path], states[b_path])
+
+    def _summarize(self, path, log_type):
+        """Analyze a log and deliver its summary; return the summary, or None if the log isn't complete."""
+        try:
+            log = MachineLog(path, self.exclude_beam_off, header_only=True)
+            if log_type == log_types['tlog'] and os.path.getsize(path) < tlog_data_size(log.header):
+                return
+            row = _analyze_log(log, *self._gamma_params)
+        except Exception as e:
+            warnings.warn("The log {} could not be analyzed: {}".format(path, e))
+            return
+        summary = {'filename': path, 'log_type': log_type}
+        summary.update(zip((name for name, _ in log_results_dtype), row))
+        self.num_logs += 1
+        if self.callback is not None:
+            self.callback(summary)
+        if self.queue is not None:
+            self.queue.put(summary)
+        return summary
+
 
 class MachineLog:
     """Reads in and analyzes MLC log files, both dynalog and trajectory logs, from Varian linear accelerators.
 
     If reading Trajectory logs, the .txt file is also loaded if it's around.
     """
-    def __init__(self, filename='', exclude_beam_off=True):
+    def __init__(self, filename='', exclude_beam_off=True, header_only=False, dtype=None):
         """
         Parameters
         ----------
@@ -282,6 +756,16 @@ class MachineLog:
         exclude_beam_off : boolean
             If True (default), snapshots where the beam was not on will be removed.
             If False, all data will be included.
+        header_only : boolean
+            If False (default), all the log data is read upon loading.
+            If True, only the header (and the .txt file of Trajectory logs) is read; the axis data is read
+            the first time ``axis_data``, ``subbeams``, or ``fluence`` is accessed. See :meth:`load`.
+
+            .. versionadded:: 0.8.0
+        dtype : numpy.dtype, None
+            The precision of the log data. See :meth:`load`.
+
+            .. versionadded:: 0.8.0
 
         Examples
         --------
@@ -300,6 +784,15 @@ class MachineLog:
 
             >>> log = MachineLog.from_UI()
 
+        Only read the header, e.g. to catalog a directory of logs quickly::
+
+            >>> log = MachineLog(mylogfile, header_only=True)
+            >>> log.header.num_snapshots
+
+        Keep all the data in single precision, e.g. to halve the memory of batch analyses::
+
+            >>> log = MachineLog(mylogfile, dtype=np.float32)
+
         Run the demo::
 
             >>> MachineLog().run_dlog_demo()
@@ -326,11 +819,15 @@ class MachineLog:
         self.filename = ''
         self.url = None
         self._cursor = 0
-        self.fluence = Fluence_Struct()
+        self._exclude_beam_off = exclude_beam_off
+        self._dtype = None
+        self._axis_data = None
+        self._subbeams = None
+        self._fluence = Fluence_Struct()
 
         # Read file if passed in
         if filename is not '':
-            self.load(filename, exclude_beam_off)
+            self.load(filename, exclude_beam_off, header_only, dtype)
 
     def run_tlog_demo(self):
         """Run the Trajectory log demo."""
@@ -395,7 +892,7 @@ class MachineLog:
         if filename: # if user didn't hit cancel...
             self.load(filename, exclude_beam_off)
 
-    def load(self, filename, exclude_beam_off=True):
+    def load(self, filename, exclude_beam_off=True, header_only=False, dtype=None):
         """Load the log file directly by passing the path to the file.
 
         Parameters
@@ -411,11 +908,26 @@ class MachineLog:
                 Including beam off data may affect fluence and gamma results. E.g. in a step-&-shoot IMRT
                 delivery, leaves move between segments while the beam is held. If beam-off data is included,
                 the RMS and fluence errors may not correspond to what was delivered.
+
+        header_only : boolean
+            If False (default), all the log data is read.
+            If True, only the header (and the .txt file of Trajectory logs) is read. The axis data, subbeams, and
+            fluence structure are read and built the first time one of them is accessed.
+
+            .. versionadded:: 0.8.0
+        dtype : numpy.dtype, None
+            If None (default), the axis data is kept in the precision it was read in (float32 for Trajectory logs,
+            float64 for dynalogs), MLC positions and gamma buffers are float32, and fluence maps are float64.
+            If a float dtype, e.g. ``np.float32``, the axis data, MLC positions, fluence maps, and gamma
+            buffers are all of that dtype. Single precision halves the memory and bandwidth of the analysis;
+            results agree with double precision to well within analysis tolerances.
+
+            .. versionadded:: 0.8.0
         """
         if is_valid_file(filename):
             if is_log(filename):
                 self.filename = filename
-                self._read_log(exclude_beam_off)
+                self._read_log(exclude_beam_off, header_only, dtype)
             else:
                 raise IOError("File passed is not a valid log file")
 
@@ -491,8 +1003,7 @@ class MachineLog:
         print("Gamma pass %: {:2.2f}".format(self.fluence.gamma.pass_prcnt))
         print("Gamma average: {:2.3f}".format(self.fluence.gamma.avg_gamma))
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def log_type(self):
         """Determine the MLC log type: Trajectory or Dynalog.
 
@@ -514,6 +1025,28 @@ class MachineLog:
             log_type = log_types['tlog']
         return log_type
 
+    @property
+    def axis_data(self):
+        """The axis data of the log; see the class Attributes. Read upon first access if the log was loaded header-only."""
+        self._read_axis_data_if_deferred()
+        if self._axis_data is None:
+            raise AttributeError("No log has been loaded yet")
+        return self._axis_data
+
+    @property
+    def subbeams(self):
+        """The subbeams of a Trajectory log; see the class Attributes. Read upon first access if the log was loaded header-only."""
+        self._read_axis_data_if_deferred()
+        if self._subbeams is None:
+            raise AttributeError("Only loaded Trajectory logs have subbeams")
+        return self._subbeams
+
+    @property
+    def fluence(self):
+        """The fluence structure of the log; see the class Attributes. Built upon first access if the log was loaded header-only."""
+        self._read_axis_data_if_deferred()
+        return self._fluence
+
     @property
     def is_loaded(self):
         """Boolean specifying if a log has been loaded in yet."""
@@ -522,6 +1055,11 @@ class MachineLog:
         else:
             return True
 
+    def _cache_inputs(self):
+        """The data analyses of the log depend on, which key the analysis cache; see :mod:`~pylinac.core.cache`."""
+        if self.is_loaded:
+            return self.filename, getattr(self, '_other_dlg_file', None), self._exclude_beam_off, self._dtype
+
     @property
     def treatment_type(self):
         try:  # tlog
@@ -594,49 +1132,95 @@ class MachineLog:
         if not is_file_object:
             print("CSV file written to: " + filename)
 
-    def _read_log(self, exclude_beam_off):
+    def to_columnar(self, filename):
+        """Write the axis and leaf data of the log to a columnar file. Applicable to both Trajectory logs and dynalogs.
+        See :func:`~pylinac.log_analyzer.write_columnar`.
+
+        .. versionadded:: 0.8.0
+        """
+        write_columnar([self], filename)
+
+    def _read_log(self, exclude_beam_off, header_only=False, dtype=None):
         """Read in log based on what type of log it is: Trajectory or Dynalog."""
+        clear_caches(self)
+        self._exclude_beam_off = exclude_beam_off
+        self._dtype = np.dtype(dtype) if dtype is not None else None
+        self._other_dlg_file = None
+        self._axis_data = None
+        self._subbeams = None
+        self._fluence = Fluence_Struct()
         if is_tlog(self.filename):
-            self._read_tlog(exclude_beam_off)
+            self._read_tlog_header()
         elif is_dlog(self.filename):
-            self._read_dlog(exclude_beam_off)
+            self._read_dlog_header()
+        if not header_only:
+            self._read_axis_data()
+
+    def _read_axis_data(self):
+        """Read in the log data following the header based on what type of log it is: Trajectory or Dynalog."""
+        if isinstance(self.header, Tlog_Header):
+            self._read_tlog_data(self._exclude_beam_off)
+        else:
+            self._read_dlog_data(self._exclude_beam_off)
+
+    def _read_axis_data_if_deferred(self):
+        """Read in the log data if the log was loaded header-only and the data hasn't been read yet."""
+        if self._axis_data is None and hasattr(self, 'header'):
+            self._read_axis_data()
 
-    def _read_dlog(self, exclude_beam_off):
-        """Read in Dynalog files from .dlg files (which are renamed CSV files).
+    def _read_dlog_header(self):
+        """Read in the header of Dynalog files from .dlg files (which are renamed CSV files).
         Formatting follows from the Dynalog File Viewer Reference Guide.
         """
         # if file is B*.dlg, replace with A*.dlg
-        other_dlg_file = _return_other_dlg(self.filename)
+        self._other_dlg_file = _return_other_dlg(self.filename)
 
-        # create iterator object to read in lines
+        # create iterator object to read in the header lines; the snapshot data is parsed in bulk afterward
         with open(self.filename) as csvf:
             dlgdata = csv.reader(csvf, delimiter=',')
             self.header, dlgdata = Dlog_Header(dlgdata)._read()
-            self.axis_data = Dlog_Axis_Data(dlgdata, self.header, other_dlg_file)._read(exclude_beam_off)
 
-        self.fluence = Fluence_Struct(self.axis_data.mlc, self.axis_data.mu, self.axis_data.jaws)
+    def _read_dlog_data(self, exclude_beam_off):
+        """Read in the axis data of Dynalog files."""
+        self._axis_data = Dlog_Axis_Data(self.filename, self.header, self._other_dlg_file,
+                                         self._dtype)._read(exclude_beam_off)
+
+        self._fluence = Fluence_Struct(self._axis_data.mlc, self._axis_data.mu, self._axis_data.jaws,
+                                       self._cache_inputs(), self._dtype)
 
-    def _read_tlog(self, exclude_beam_off):
-        """Read in Trajectory log from binary file according to TB 1.5/2.0 (i.e. Tlog v2.1/3.0) log file specifications."""
+    def _read_tlog_header(self):
+        """Read in the header of a Trajectory log according to TB 1.5/2.0 (i.e. Tlog v2.1/3.0) log file specifications."""
         # read in associated *.txt file if in the same directory.
         if is_tlog_txt_file_around(self.filename):
             self._read_txt_file()
 
-        # read in trajectory log binary data
-        fcontent = open_file(self.filename).read()
+        # only the fixed-size header section is read from the file
+        if isinstance(self.filename, str):
+            with open(self.filename, 'rb') as tlogf:
+                fcontent = tlogf.read(TLOG_HEADER_SIZE)
+        else:
+            fcontent = open_file(self.filename).read(TLOG_HEADER_SIZE)
+        self._cursor = 0
 
         # Unpack the content according to respective section and data type (see log specification file).
         self.header, self._cursor = Tlog_Header(fcontent, self._cursor)._read()
 
-        self.subbeams, self._cursor = SubbeamHandler(fcontent, self._cursor, self.header)._read()
+    def _read_tlog_data(self, exclude_beam_off):
+        """Read in the subbeams and axis data of a Trajectory log, which follow the header."""
+        # map the trajectory log binary data into memory; the snapshot data is viewed in place rather than copied
+        fcontent = map_file(self.filename)
+        cursor = self._cursor
 
-        self.axis_data, self._cursor = Tlog_Axis_Data(fcontent, self._cursor, self.header)._read(exclude_beam_off)
+        self._subbeams, cursor = SubbeamHandler(fcontent, cursor, self.header)._read()
 
-        # self.crc = CRC(fcontent, self._cursor).read()
+        self._axis_data, cursor = Tlog_Axis_Data(fcontent, cursor, self.header, self._dtype)._read(exclude_beam_off)
 
-        self.fluence = Fluence_Struct(self.axis_data.mlc, self.axis_data.mu, self.axis_data.jaws)
+        # self.crc = CRC(fcontent, cursor).read()
 
-        self.subbeams.post_hoc_metadata(self.axis_data)
+        self._fluence = Fluence_Struct(self._axis_data.mlc, self._axis_data.mu, self._axis_data.jaws,
+                                       self._cache_inputs(), self._dtype)
+
+        self._subbeams.post_hoc_metadata(self._axis_data)
 
     def _read_txt_file(self):
         """Read a Tlog's associated .txt file and put in under the 'txt' attribute."""
@@ -677,8 +1261,7 @@ class Axis:
                 pass
             self.expected = expected
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def difference(self):
         """Return an array of the difference between actual and expected positions.
 
@@ -727,8 +1310,7 @@ class Axis:
 
 class _Axis_Moved:
     """Mixin class for Axis."""
-    @property
-    @lru_cache()
+    @lazyproperty
     def moved(self):
         """Return whether the axis moved during treatment."""
         threshold = 0.003
@@ -776,22 +1358,42 @@ class Fluence(metaclass=ABCMeta):
         matrix will be 60-x-4000.
     resolution : int, float
         The resolution of the fluence calculation; -1 means calculation has not been done yet.
+    base_resolution : int, float, None
+        The resolution the map was binned from, or None if it was calculated directly. See :meth:`calc_map`.
+    snapshots : slice, numpy.ndarray, None
+        The window of snapshots the map was calculated over, or None if it's of the whole log. See :meth:`calc_map`.
     """
     pixel_map = np.ndarray
     resolution = -1
+    base_resolution = None
+    snapshots = None
     _fluence_type = ''  # must be specified by subclass
 
-    def __init__(self, mlc_struct=None, mu_axis=None, jaw_struct=None):
+    def __init__(self, mlc_struct=None, mu_axis=None, jaw_struct=None, source=None, dtype=float):
         """
         Parameters
         ----------
         mlc_struct : MLC_Struct
         mu_axis : Beam_Axis
         jaw_struct : Jaw_Struct
+        source : tuple, None
+            The inputs of the log the fluence is from, which key its results in the analysis cache.
+            If None, results aren't cached on disk. See :mod:`~pylinac.core.cache`.
+        dtype : numpy.dtype
+            The dtype of the fluence map.
+
+            .. versionadded:: 0.8.0
         """
         self._mlc = mlc_struct
         self._mu = mu_axis
         self._jaws = jaw_struct
+        self._source = source
+        self._dtype = dtype
+
+    def _cache_inputs(self):
+        """The data the fluence depends on; see :mod:`~pylinac.core.cache`."""
+        if self._source is not None:
+            return self._source, self._fluence_type
 
     @property
     def map_calced(self):
@@ -801,8 +1403,8 @@ class Fluence(metaclass=ABCMeta):
         else:
             return False
 
-    @lru_cache()
-    def calc_map(self, resolution=0.1):
+    @value_accept(method=fluence_methods)
+    def calc_map(self, resolution=0.1, method='vectorized', base_resolution=None, snapshots=None):
         """Calculate a fluence pixel map.
 
         Fluence calculation is done by adding fluence snapshot by snapshot, and leaf pair by leaf pair.
@@ -815,6 +1417,34 @@ class Fluence(metaclass=ABCMeta):
         ----------
         resolution : int, float
             The resolution in mm of the fluence calculation in the leaf-moving direction.
+        method : {'vectorized', 'loop'}
+            The fluence engine to use.
+            If 'vectorized' (default), the fluence line of each leaf pair is computed in one array operation
+            by accumulating the MU of each snapshot at the left edge and subtracting it at the right edge
+            (a difference array), then taking the cumulative sum.
+            If 'loop', the fluence is added snapshot by snapshot. This is the original engine and is much slower;
+            it is kept for verification purposes. Both engines produce the same map.
+
+            .. versionadded:: 0.8.0
+        base_resolution : int, float, None
+            If None (default), the map is calculated at the resolution.
+            If a resolution, the map is calculated once at this finer resolution and the map at ``resolution`` is
+            derived from it by averaging each bin of resolution/base_resolution pixels, which must be a whole number.
+            The maps at both resolutions are kept, so maps at several resolutions (a fluence pyramid) cost one fluence
+            calculation. Binned pixels are the average fluence over their area, so they may differ slightly from a
+            map calculated directly at the coarser resolution, whose leaf edges are rounded to the coarser pixels.
+
+            .. versionadded:: 0.8.0
+        snapshots : slice, sequence, numpy.ndarray, None
+            If None (default), the fluence of the whole log is calculated.
+            Otherwise, the window of the log's snapshots to calculate the fluence of, as a slice, snapshot indices,
+            or a boolean array, e.g. the ``snapshots`` of a subbeam. Only the snapshots where the beam was on
+            (see :meth:`MachineLog.load`) are included. The fluence is in the same units as that of the whole log,
+            so the maps of windows that divide the log add up to the map of the whole log; pairs that didn't move
+            receive the fraction of the MU delivered in the window rather than 1. Windowed maps aren't cached.
+            See also :class:`FluenceAccumulator`.
+
+            .. versionadded:: 0.8.0
 
          Returns
          -------
@@ -823,36 +1453,124 @@ class Fluence(metaclass=ABCMeta):
              be the number of MLC pairs by 400 / resolution since the MLCs can move anywhere within the
              40cm-wide linac head opening.
          """
-        # return if map has already been calculated under the same conditions
-        # if self.map_calced and self._same_conditions(resolution):
-        #     return self.pixel_map
-        # preallocate arrays for expected and actual fluence of number of leaf pairs-x-4000 (40cm = 4000um, etc)
-        fluence = np.zeros((self._mlc.num_pairs, 400 / resolution), dtype=float)
+        if snapshots is not None:
+            fluence = self._window_fluence_map(resolution, snapshots, method, base_resolution)
+        elif base_resolution is None:
+            fluence = self._fluence_map(resolution, method)
+        else:
+            fluence = self._binned_fluence_map(resolution, base_resolution, method)
+        self.pixel_map = fluence
+        self.resolution = resolution
+        self.base_resolution = base_resolution
+        self.snapshots = snapshots
+        return fluence
 
-        # calculate the MU delivered in each snapshot. For Tlogs this is absolute; for dynalogs it's normalized.
-        mu_matrix = getattr(self._mu, self._fluence_type)
+    @instance_cache(maxsize=8, maxbytes=2**28)
+    def _binned_fluence_map(self, resolution, base_resolution, method):
+        """Bin the fluence map at the base resolution down to the resolution; results are kept per instance up to
+        256MB. See :meth:`calc_map`."""
+        bin_size = self._bin_size(resolution, base_resolution)
+        return self._bin_map(self._fluence_map(base_resolution, method), bin_size)
+
+    def _window_fluence_map(self, resolution, snapshots, method='vectorized', base_resolution=None):
+        """Calculate the fluence map of a window of snapshots. See :meth:`calc_map`."""
+        if base_resolution is not None:
+            bin_size = self._bin_size(resolution, base_resolution)
+            resolution = base_resolution
+        window = self._window_snapshots(snapshots)
+        if method == fluence_methods['loop']:
+            fluence = self._calc_map_loop(resolution, window)
+        else:
+            fluence = self._calc_map_vectorized(resolution, window)
+        if base_resolution is not None:
+            fluence = self._bin_map(fluence, bin_size)
+        return fluence
+
+    def _window_snapshots(self, snapshots):
+        """Return the indices of the beam-on snapshots (see :attr:`MLC.snapshot_idx`) within a window of snapshots."""
+        window = np.zeros(self._mlc.actual.shape[1], dtype=bool)
+        window[snapshots] = True
+        snapshot_idx = np.asarray(self._mlc.snapshot_idx)
+        return snapshot_idx[window[snapshot_idx]]
+
+    @staticmethod
+    def _bin_size(resolution, base_resolution):
+        """Return the number of base resolution pixels per pixel at the resolution, which must be a whole number."""
+        bin_size = int(round(resolution / base_resolution))
+        if bin_size < 1 or not np.isclose(resolution / base_resolution, bin_size) or \
+                int(400 / base_resolution) != int(400 / resolution) * bin_size:
+            raise ValueError("The fluence resolution must be a whole multiple of the base resolution")
+        return bin_size
+
+    @staticmethod
+    def _bin_map(fluence, bin_size):
+        """Average each bin of bin_size pixels of a fluence map along the leaf-moving direction."""
+        if bin_size == 1:
+            return fluence
+        return fluence.reshape(len(fluence), -1, bin_size).mean(axis=2, dtype=float).astype(fluence.dtype, copy=False)
+
+    @instance_cache(maxsize=8, maxbytes=2**28)
+    @cached_analysis()
+    def _fluence_map(self, resolution, method):
+        """Calculate the fluence map; results are kept per instance up to 256MB. See :meth:`calc_map`."""
+        if method == fluence_methods['loop']:
+            return self._calc_map_loop(resolution)
+        else:
+            return self._calc_map_vectorized(resolution)
+
+    def _MU_differential(self):
+        """Return the fraction of the total MU delivered in each snapshot. For Tlogs this is absolute; for dynalogs it's normalized."""
+        # upcast so the differences of large cumulative MU values don't lose precision
+        mu_matrix = np.asarray(getattr(self._mu, self._fluence_type), dtype=float)
         MU_differential = np.zeros(len(mu_matrix))
         MU_differential[0] = mu_matrix[0]
         MU_differential[1:] = np.diff(mu_matrix)
-        MU_differential = MU_differential / mu_matrix[-1]
-        MU_cumulative = 1
+        return MU_differential / mu_matrix[-1]
+
+    def _total_MU(self):
+        """Return the MU at the last snapshot, to which the fluence is normalized."""
+        return float(getattr(self._mu, self._fluence_type)[-1])
+
+    def _pair_edges(self, pair, resolution):
+        """Return the left & right leaf positions and left & right jaw positions of a leaf pair in fluence pixel units.
+
+        If ``pair`` is an array of pair numbers, the leaf positions have a row per pair."""
+        # positions are converted in double precision so pixel edges don't depend on the precision the log was read in
+        pos_offset = int(np.round(200 / resolution))
+        leaf_positions = getattr(self._mlc, self._fluence_type)
+        left_leaf_data = np.asarray(leaf_positions[pair - 1], dtype=float)
+        left_leaf_data = -np.round(left_leaf_data * 10 / resolution) + pos_offset
+        right_leaf_data = np.asarray(leaf_positions[pair - 1 + self._mlc.num_pairs], dtype=float)
+        right_leaf_data = np.round(right_leaf_data * 10 / resolution) + pos_offset
+        x1_data = np.asarray(self._jaws.x1.actual, dtype=float)
+        x2_data = np.asarray(self._jaws.x2.actual, dtype=float)
+        left_jaw_data = np.round((200 / resolution) - (x1_data * 10 / resolution))
+        right_jaw_data = np.round((x2_data * 10 / resolution) + (200 / resolution))
+        return left_leaf_data, right_leaf_data, left_jaw_data, right_jaw_data
+
+    def _calc_map_loop(self, resolution, window=None):
+        """Calculate the fluence map snapshot by snapshot, of the whole log or a window of beam-on snapshot indices.
+        See :meth:`calc_map`."""
+        # preallocate arrays for expected and actual fluence of number of leaf pairs-x-4000 (40cm = 4000um, etc)
+        fluence = np.zeros((self._mlc.num_pairs, int(400 / resolution)), dtype=self._dtype)
+
+        # calculate the MU delivered in each snapshot.
+        MU_differential = self._MU_differential()
+        if window is None:
+            window = self._mlc.snapshot_idx
+            MU_cumulative = 1
+        else:
+            MU_cumulative = MU_differential[window].sum()
 
         # calculate each "line" of fluence (the fluence of an MLC leaf pair, e.g. 1 & 61, 2 & 62, etc),
         # and add each "line" to the total fluence matrix
-        fluence_line = np.zeros((400 / resolution))
-        leaf_offset = self._mlc.num_pairs
-        pos_offset = int(np.round(200 / resolution))
+        fluence_line = np.zeros(int(400 / resolution))
         for pair in range(1, self._mlc.num_pairs + 1):
-            if not self._mlc.leaf_under_y_jaw(pair):
+            if not self._mlc.pairs_under_y_jaw[pair - 1]:
                 fluence_line[:] = 0  # emtpy the line values on each new leaf pair
-                left_leaf_data = getattr(self._mlc.leaf_axes[pair], self._fluence_type)
-                left_leaf_data = -np.round(left_leaf_data * 10 / resolution) + pos_offset
-                right_leaf_data = getattr(self._mlc.leaf_axes[pair + leaf_offset], self._fluence_type)
-                right_leaf_data = np.round(right_leaf_data * 10 / resolution) + pos_offset
-                left_jaw_data = np.round((200 / resolution) - (self._jaws.x1.actual * 10 / resolution))
-                right_jaw_data = np.round((self._jaws.x2.actual * 10 / resolution) + (200 / resolution))
-                if self._mlc.pair_moved(pair):
-                    for snapshot in self._mlc.snapshot_idx:
+                left_leaf_data, right_leaf_data, left_jaw_data, right_jaw_data = self._pair_edges(pair, resolution)
+                if self._mlc.pairs_moved[pair - 1]:
+                    for snapshot in window:
                         lt_mlc_pos = left_leaf_data[snapshot]
                         rt_mlc_pos = right_leaf_data[snapshot]
                         lt_jaw_pos = left_jaw_data[snapshot]
@@ -866,13 +1584,63 @@ class Fluence(metaclass=ABCMeta):
                     rt_mlc_pos = right_leaf_data[first_snapshot]
                     lt_jaw_pos = left_jaw_data.min()
                     rt_jaw_pos = right_jaw_data.max()
-                    left_edge = max(lt_mlc_pos, lt_jaw_pos)
-                    right_edge = min(rt_mlc_pos, rt_jaw_pos)
+                    left_edge = int(max(lt_mlc_pos, lt_jaw_pos))
+                    right_edge = int(min(rt_mlc_pos, rt_jaw_pos))
                     fluence_line[left_edge:right_edge] = MU_cumulative
                 fluence[pair - 1, :] = fluence_line
+        return fluence
 
-        self.pixel_map = fluence
-        self.resolution = resolution
+    def _calc_map_vectorized(self, resolution, window=None):
+        """Calculate the fluence map using difference arrays, of the whole log or a window of beam-on snapshot indices.
+        See :meth:`calc_map`.
+
+        For each snapshot, the MU fraction is added at the left aperture edge and subtracted at the right edge of an
+        array one pixel wider than the fluence line. The cumulative sum of that array is the fluence line.
+        All moving pairs and all snapshots are accumulated at once with ``np.bincount``.
+        """
+        num_pixels = int(400 / resolution)
+        fluence = np.zeros((self._mlc.num_pairs, num_pixels), dtype=self._dtype)
+        MU_differential = self._MU_differential()
+        if window is None:
+            snapshots = np.asarray(self._mlc.snapshot_idx)
+            MU_cumulative = 1
+        else:
+            snapshots = np.asarray(window)
+            MU_cumulative = MU_differential[snapshots].sum()
+
+        # the edges of all the pairs not under the y jaws, one row per pair
+        pairs = np.flatnonzero(~self._mlc.pairs_under_y_jaw) + 1
+        left_leaf_data, right_leaf_data, left_jaw_data, right_jaw_data = self._pair_edges(pairs, resolution)
+        moved = self._mlc.pairs_moved[pairs - 1]
+
+        # pairs that didn't move; the aperture is set by the first snapshot and the widest jaw opening
+        first_snapshot = self._mlc.snapshot_idx[0]
+        left_jaw_edge, right_jaw_edge = left_jaw_data.min(), right_jaw_data.max()
+        for pair, left_leaf, right_leaf in zip(pairs[~moved], left_leaf_data[~moved, first_snapshot],
+                                               right_leaf_data[~moved, first_snapshot]):
+            left_edge = int(max(left_leaf, left_jaw_edge))
+            right_edge = int(min(right_leaf, right_jaw_edge))
+            fluence[pair - 1, left_edge:right_edge] = MU_cumulative
+
+        if moved.any():
+            moving_pairs = pairs[moved] - 1
+            moving_left_edges = np.maximum(left_leaf_data[moved][:, snapshots], left_jaw_data[snapshots])
+            moving_right_edges = np.minimum(right_leaf_data[moved][:, snapshots], right_jaw_data[snapshots])
+            # truncate edges to pixel indices the same way int() does, then confine them to the fluence line
+            left_edges = np.clip(moving_left_edges.astype(int), 0, num_pixels)
+            right_edges = np.clip(moving_right_edges.astype(int), 0, num_pixels)
+            weights = np.broadcast_to(MU_differential[snapshots], left_edges.shape)
+            open_aperture = right_edges > left_edges
+
+            # offset the edges of each pair so all pairs can be accumulated into one flat difference array
+            row_offsets = np.arange(len(moving_pairs))[:, np.newaxis] * (num_pixels + 1)
+            left_idx = (left_edges + row_offsets)[open_aperture]
+            right_idx = (right_edges + row_offsets)[open_aperture]
+            weights = weights[open_aperture]
+            size = len(moving_pairs) * (num_pixels + 1)
+            difference = np.bincount(left_idx, weights, minlength=size) - np.bincount(right_idx, weights, minlength=size)
+            difference = difference.reshape(len(moving_pairs), num_pixels + 1)
+            fluence[moving_pairs, :] = np.cumsum(difference, axis=1)[:, :num_pixels]
         return fluence
 
     def plot_map(self, show=True):
@@ -908,7 +1676,15 @@ class GammaFluence(Fluence):
     pixel_map : numpy.ndarray
         The gamma map. Only available after calling calc_map()
     passfail_map : numpy.ndarray
-        The gamma pass/fail map; pixels that pass (<1.0) are set to 0, while failing pixels (>=1.0) are set to 1.
+        The gamma pass/fail map, the same shape as the gamma map; pixels that pass (<1.0) are False,
+        while failing pixels (>=1.0) are True.
+    doseTA_map : numpy.ndarray
+        The dose-to-agreement component of gamma, i.e. the dose difference in units of doseTA.
+        Only available after calling calc_map() with ``calc_individual_maps=True``.
+    distTA_map : numpy.ndarray
+        The distance-to-agreement component of gamma, i.e. the dose difference divided by the fluence gradient,
+        in units of distTA. Pixels with a dose difference but no gradient are infinite.
+        Only available after calling calc_map() with ``calc_individual_maps=True``.
     distTA : int, float
         The distance to agreement value used in gamma calculation.
     doseTA : int, float
@@ -925,12 +1701,12 @@ class GammaFluence(Fluence):
     threshold = -1
     pass_prcnt = -1
     avg_gamma = -1
-    # doseTA_map = np.ndarray
-    # distTA_map = np.ndarray
+    doseTA_map = np.ndarray
+    distTA_map = np.ndarray
     passfail_map = np.ndarray
     bins = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1, 1.1]
 
-    def __init__(self, actual_fluence, expected_fluence, mlc_struct):
+    def __init__(self, actual_fluence, expected_fluence, mlc_struct, source=None, dtype=np.float32):
         """
         Parameters
         ----------
@@ -940,18 +1716,29 @@ class GammaFluence(Fluence):
             The expected fluence object.
         mlc_struct : MLC_Struct
             The MLC structure, so fluence can be calculated from leaf positions.
+        source : tuple, None
+            The inputs of the log the fluence is from, which key its results in the analysis cache.
+            If None, results aren't cached on disk. See :mod:`~pylinac.core.cache`.
+        dtype : numpy.dtype
+            The dtype of the gamma working buffers and maps.
+
+            .. versionadded:: 0.8.0
         """
         self._actual_fluence = actual_fluence
         self._expected_fluence = expected_fluence
         self._mlc = mlc_struct
+        self._source = source
+        self._dtype = dtype
 
-    @lru_cache()
-    def calc_map(self, doseTA=1, distTA=1, threshold=10, resolution=0.1, calc_individual_maps=False):
+    @value_accept(method=gamma_methods)
+    def calc_map(self, doseTA=1, distTA=1, threshold=10, resolution=0.1, calc_individual_maps=False, method='bakai',
+                 search_radius=None, base_resolution=None, snapshots=None):
         """Calculate the gamma from the actual and expected fluences.
 
-        The gamma calculation is based on `Bakai et al
+        By default the gamma calculation is based on `Bakai et al
         <http://iopscience.iop.org/0031-9155/48/21/006/>`_ eq.6,
         which is a quicker alternative to the standard Low gamma equation.
+        The standard search-based gamma of `Low et al <http://dx.doi.org/10.1118/1.598248>`_ can be used instead.
 
         Parameters
         ----------
@@ -964,59 +1751,68 @@ class GammaFluence(Fluence):
         resolution : int, float
             The resolution in mm of the resulting gamma map in the leaf-movement direction.
         calc_individual_maps : bool
-            Not yet implemented.
-            If True, separate pixel maps for the distance-to-agreement and dose-to-agreement are created.
+            If True, separate pixel maps for the distance-to-agreement and dose-to-agreement are created
+            and set as the ``distTA_map`` and ``doseTA_map`` attributes.
+
+            .. versionadded:: 0.8.0
+        method : {'bakai', 'search'}
+            The gamma algorithm.
+            If 'bakai' (default), gamma is approximated from the dose difference and the gradient of the actual fluence.
+            If 'search', gamma of each expected pixel is the minimum, over the actual pixels of the same leaf pair, of
+            sqrt((distance / distTA)^2 + (dose difference / doseTA)^2). The dose difference is relative to the fluence of
+            the full delivery, i.e. a global dose criterion. The search is accelerated with a KD-tree over the
+            dose-augmented pixel coordinates and limited to ``search_radius``. With this method the individual maps are
+            the dose and distance terms of the minimizing pixel.
+
+            .. versionadded:: 0.8.0
+        search_radius : int, float, None
+            The maximum distance in mm searched for agreement when ``method='search'``. Gamma values are capped at
+            search_radius / distTA, so the radius should be at least distTA for pass/fail results to be exact.
+            If None (default), 3 times the distTA is used.
+
+            .. versionadded:: 0.8.0
+        base_resolution : int, float, None
+            If given, the fluences are calculated at this finer resolution and binned to the resolution, so gamma at
+            several resolutions costs one fluence calculation. See :meth:`Fluence.calc_map`.
+
+            .. versionadded:: 0.8.0
+        snapshots : slice, sequence, numpy.ndarray, None
+            If given, gamma is calculated from the fluences of only this window of snapshots, e.g. the ``snapshots``
+            of a subbeam for per-arc analysis. See :meth:`Fluence.calc_map`. Windowed results aren't cached.
+
+            .. versionadded:: 0.8.0
 
         Returns
         -------
         numpy.ndarray
-            A num_mlc_leaves-x-400/resolution numpy array.
+            A num_mlc_leaves-x-400/resolution numpy array; float32 unless the log was loaded with another dtype.
         """
-        # if gamma has been calculated under same conditions, return it
-        # if self.map_calced and self._same_conditions(distTA, doseTA, threshold, resolution):
-        #     return self.pixel_map
-
         # calc fluences if need be
-        if not self._actual_fluence.map_calced or resolution != self._actual_fluence.resolution:
-            self._actual_fluence.calc_map(resolution)
-        if not self._expected_fluence.map_calced or resolution != self._expected_fluence.resolution:
-            self._expected_fluence.calc_map(resolution)
-
-        actual = copy.copy(self._actual_fluence.pixel_map)
-        expected = copy.copy(self._expected_fluence.pixel_map)
-
-        # set dose values below threshold to 0 so gamma doesn't calculate over it
-        actual[actual < (threshold / 100) * np.max(actual)] = 0
-        expected[expected < (threshold / 100) * np.max(expected)] = 0
-
-        # preallocation
-        gamma_map = np.zeros(expected.shape)
-
-        # image gradient in x-direction (leaf movement direction) using sobel filter
-        img_x = spf.sobel(actual, 1)
+        for fluence in (self._actual_fluence, self._expected_fluence):
+            if not fluence.map_calced or resolution != fluence.resolution or \
+                    base_resolution != fluence.base_resolution or snapshots is not None or \
+                    fluence.snapshots is not None:
+                fluence.calc_map(resolution, base_resolution=base_resolution, snapshots=snapshots)
+
+        if method == gamma_methods['search'] and search_radius is None:
+            search_radius = 3 * distTA
+        if snapshots is None:
+            gamma_map, doseTA_map, distTA_map = self._gamma_maps(doseTA, distTA, threshold, resolution,
+                                                                 calc_individual_maps, method, search_radius,
+                                                                 base_resolution)
+        else:
+            gamma_map, doseTA_map, distTA_map = self._calc_gamma_maps(doseTA, distTA, threshold, resolution,
+                                                                      calc_individual_maps, method, search_radius)
+        if calc_individual_maps:
+            self.doseTA_map = doseTA_map
+            self.distTA_map = distTA_map
 
-        # equation: (measurement - reference) / sqrt ( doseTA^2 + distTA^2 * image_gradient^2 )
-        for leaf in range(self._mlc.num_pairs):
-            gamma_map[leaf] = np.abs(actual[leaf, :] - expected[leaf, :]) / np.sqrt(
-                (doseTA / 100.0 ** 2) + ((distTA / resolution ** 2) * (img_x[leaf, :] ** 2)))
         # construct binary pass/fail map
-        self.passfail_map = np.array(np.where(gamma_map >= 1, 1, 0)[0], dtype=bool)
-
-        # if calc_individual_maps:
-        #     # calculate DoseTA map (drops distTA calc from gamma eq)
-        #     self.doseTA_map = np.zeros(gamma_map.shape)
-        #     for leaf in range(self.mlc.num_pairs):
-        #         self.doseTA_map[leaf] = (actual[leaf, :] - expected[leaf, :]) / np.sqrt(
-        #             (DoseTA / 100.0 ** 2))
-        #     # calculate DistTA map (drops DoseTA calc from gamma eq)
-        #     self.distTA_map = np.zeros(gamma_map.shape)
-        #     for leaf in range(self.mlc.num_pairs):
-        #         self.distTA_map[leaf] = (actual[leaf, :] - expected[leaf, :]) / np.sqrt(
-        #             ((DistTA / resolution ** 2) * (img_x[leaf, :] ** 2)))
+        self.passfail_map = gamma_map >= 1
 
         # calculate standard metrics
         self.pass_prcnt = (np.sum(gamma_map < 1) / np.sum(gamma_map >= 0)) * 100
-        self.avg_gamma = np.nanmean(gamma_map)
+        self.avg_gamma = float(np.nanmean(gamma_map, dtype=float))
 
         self.distTA = distTA
         self.doseTA = doseTA
@@ -1026,6 +1822,104 @@ class GammaFluence(Fluence):
         self.pixel_map = gamma_map
         return gamma_map
 
+    @instance_cache(maxsize=8, maxbytes=2**28)
+    @cached_analysis()
+    def _gamma_maps(self, doseTA, distTA, threshold, resolution, calc_individual_maps, method, search_radius,
+                    base_resolution):
+        """Calculate the gamma map and, if asked, the doseTA and distTA maps from the fluence maps at the resolution
+        (binned from the base resolution, if any); results are kept per instance up to 256MB. See :meth:`calc_map`."""
+        return self._calc_gamma_maps(doseTA, distTA, threshold, resolution, calc_individual_maps, method, search_radius)
+
+    def _calc_gamma_maps(self, doseTA, distTA, threshold, resolution, calc_individual_maps, method, search_radius):
+        """Calculate the gamma map and, if asked, the doseTA and distTA maps from the current fluence maps."""
+        # read the fluences into working buffers of the gamma dtype, setting dose values below threshold to 0
+        # so gamma doesn't calculate over them. The fluence maps themselves are left untouched.
+        actual = self._thresholded_map(self._actual_fluence.pixel_map, threshold, self._dtype)
+        expected = self._thresholded_map(self._expected_fluence.pixel_map, threshold, self._dtype)
+
+        if method == gamma_methods['search']:
+            return self._calc_search_gamma(actual, expected, doseTA, distTA, resolution, search_radius,
+                                           calc_individual_maps)
+        else:
+            return self._calc_bakai_gamma(actual, expected, doseTA, distTA, resolution, calc_individual_maps)
+
+    def _calc_bakai_gamma(self, actual, gamma_map, doseTA, distTA, resolution, calc_individual_maps):
+        """Calculate the Bakai gamma map in place of the expected map buffer. See :meth:`calc_map`.
+
+        Returns the gamma map and, if calc_individual_maps is True, the doseTA and distTA maps (else None).
+        """
+        # image gradient in x-direction (leaf movement direction) using sobel filter
+        img_x = spf.sobel(actual, 1)
+
+        # equation: |measurement - reference| / sqrt ( doseTA^2 + distTA^2 * image_gradient^2 ), computed in place
+        np.subtract(actual, gamma_map, out=gamma_map)
+        np.abs(gamma_map, out=gamma_map)
+        del actual
+        np.square(img_x, out=img_x)
+        img_x *= distTA / resolution ** 2
+        doseTA_map = distTA_map = None
+        if calc_individual_maps:
+            # calculate DoseTA map (drops distTA calc from gamma eq) and DistTA map (drops DoseTA calc from gamma eq)
+            doseTA_map = gamma_map / gamma_map.dtype.type(np.sqrt(doseTA / 100.0 ** 2))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                distTA_map = gamma_map / np.sqrt(img_x)
+            distTA_map[gamma_map == 0] = 0
+        img_x += doseTA / 100.0 ** 2
+        np.sqrt(img_x, out=img_x)
+        gamma_map /= img_x
+        return gamma_map, doseTA_map, distTA_map
+
+    def _calc_search_gamma(self, actual, expected, doseTA, distTA, resolution, search_radius, calc_individual_maps):
+        """Calculate the search-based gamma map. See :meth:`calc_map`.
+
+        Each pixel is a point of (leaf pair, position / distTA, dose / doseTA). The Euclidean distance between an
+        expected and an actual point of the same leaf pair is then their gamma, so the gamma of an expected pixel is the
+        distance to its nearest neighbor among the actual points. Leaf pairs are spaced further apart than the
+        search limit so they never match each other.
+
+        Returns the gamma map and, if calc_individual_maps is True, the doseTA and distTA maps (else None).
+        """
+        dose_criterion = doseTA / 100  # fluences are normalized to the full delivery
+        max_gamma = search_radius / distTA
+        num_pairs, num_pixels = actual.shape
+
+        # gamma at the same position is the dose difference alone and an upper bound of the searched gamma;
+        # where it's 0 there's nothing to search
+        gamma_map = np.abs(actual - expected)
+        gamma_map /= dose_criterion
+        search_idx = np.flatnonzero(gamma_map)
+
+        pair_coords = np.arange(num_pairs) * (max_gamma + 1)
+        position_coords = np.arange(num_pixels) * (resolution / distTA)
+        actual_points = np.column_stack((np.repeat(pair_coords, num_pixels), np.tile(position_coords, num_pairs),
+                                         actual.ravel() / dose_criterion))
+        search_pairs, search_positions = np.divmod(search_idx, num_pixels)
+        expected_points = np.column_stack((pair_coords[search_pairs], position_coords[search_positions],
+                                           expected.ravel()[search_idx] / dose_criterion))
+        distances, nearest_idx = cKDTree(actual_points).query(expected_points, distance_upper_bound=max_gamma)
+        found = np.isfinite(distances)
+        gamma_map.ravel()[search_idx] = np.where(found, distances, max_gamma)
+
+        doseTA_map = distTA_map = None
+        if calc_individual_maps:
+            # the dose and distance terms of the nearest point; where none was found, those of the same position
+            doseTA_map = np.abs(actual - expected) / gamma_map.dtype.type(dose_criterion)
+            distTA_map = np.zeros(gamma_map.shape, dtype=gamma_map.dtype)
+            found_idx = search_idx[found]
+            nearest_idx = nearest_idx[found]
+            doseTA_map.ravel()[found_idx] = np.abs(actual.ravel()[nearest_idx] - expected.ravel()[found_idx]) / dose_criterion
+            distTA_map.ravel()[found_idx] = np.abs(nearest_idx - found_idx) * (resolution / distTA)
+        return gamma_map, doseTA_map, distTA_map
+
+    @staticmethod
+    def _thresholded_map(fluence_map, threshold, dtype=np.float32):
+        """Return a copy of a fluence map of the dtype with the values below the threshold percent of its maximum set
+        to 0."""
+        below_threshold = fluence_map < (threshold / 100) * np.max(fluence_map)
+        thresholded = fluence_map.astype(dtype)
+        thresholded[below_threshold] = 0
+        return thresholded
+
     def plot_map(self, show=True):
         """Plot the fluence; the fluence (pixel map) must have been calculated first."""
         if not self.map_calced:
@@ -1092,6 +1986,68 @@ class GammaFluence(Fluence):
             raise AttributeError("Map not yet calculated; use calc_map()")
 
 
+class FluenceAccumulator:
+    """Accumulates a fluence map one window of snapshots at a time.
+
+    The fluence of each window is calculated from only its own snapshots and added to the running map, so the map
+    of a delivery can be updated as it progresses, e.g. control point window by control point window, or as a log
+    that is still being written is reread, without recalculating it from the first snapshot.
+
+    .. versionadded:: 0.8.0
+
+    Attributes
+    ----------
+    resolution : int, float
+        The resolution in mm of the fluence map in the leaf-moving direction.
+    fluence_type : {'actual', 'expected'}
+        The fluence accumulated.
+    mu : float
+        The MU of the delivery as of the last window added, to which the map is normalized.
+    num_windows : int
+        The number of windows added.
+    """
+    @value_accept(fluence_type=('actual', 'expected'))
+    def __init__(self, resolution=0.1, fluence_type='actual'):
+        self.resolution = resolution
+        self.fluence_type = fluence_type
+        self.mu = 0
+        self.num_windows = 0
+        self._mu_map = None  # the accumulated fluence in units of MU
+
+    def add(self, log, snapshots):
+        """Add the fluence of a window of snapshots of a log to the map.
+
+        Parameters
+        ----------
+        log : MachineLog
+            The log of the delivery. It may be a newer read of the log the earlier windows were added from.
+        snapshots : slice, sequence, numpy.ndarray
+            The window of the log's snapshots; see :meth:`Fluence.calc_map`. Windows shouldn't overlap.
+
+        Returns
+        -------
+        numpy.ndarray
+            The accumulated fluence map; see :attr:`pixel_map`.
+        """
+        fluence = getattr(log.fluence, self.fluence_type)
+        total_mu = fluence._total_MU()
+        window_map = fluence._window_fluence_map(self.resolution, snapshots) * total_mu
+        if self._mu_map is None:
+            self._mu_map = window_map
+        else:
+            self._mu_map += window_map
+        self.mu = total_mu
+        self.num_windows += 1
+        return self.pixel_map
+
+    @property
+    def pixel_map(self):
+        """The accumulated fluence map, normalized like the map of a whole log."""
+        if self._mu_map is None:
+            raise AttributeError("No snapshots have been added yet; use add()")
+        return self._mu_map / self.mu
+
+
 class Fluence_Struct:
     """Structure for data and methods having to do with fluences.
 
@@ -1104,15 +2060,38 @@ class Fluence_Struct:
     gamma : :class:`~pylinac.log_analyzer.GammaFluence`
         The gamma structure regarding the actual and expected fluences.
     """
-    def __init__(self, mlc_struct=None, mu_axis=None, jaw_struct=None):
-        self.actual = ActualFluence(mlc_struct, mu_axis, jaw_struct)
-        self.expected = ExpectedFluence(mlc_struct, mu_axis, jaw_struct)
-        self.gamma = GammaFluence(self.actual, self.expected, mlc_struct)
+    def __init__(self, mlc_struct=None, mu_axis=None, jaw_struct=None, source=None, dtype=None):
+        # by default fluence maps are double precision and gamma buffers single precision
+        fluence_dtype, gamma_dtype = (float, np.float32) if dtype is None else (dtype, dtype)
+        self.actual = ActualFluence(mlc_struct, mu_axis, jaw_struct, source, fluence_dtype)
+        self.expected = ExpectedFluence(mlc_struct, mu_axis, jaw_struct, source, fluence_dtype)
+        self.gamma = GammaFluence(self.actual, self.expected, mlc_struct, source, gamma_dtype)
+
+
+class _Leaf_Axes(Mapping):
+    """A read-only mapping of leaf number to a :class:`Leaf_Axis` viewing that leaf's row of the MLC position arrays."""
+    def __init__(self, mlc):
+        self._mlc = mlc
+        self._axes = {}
+
+    def __getitem__(self, leaf_num):
+        if not isinstance(leaf_num, (int, np.integer)) or not 1 <= leaf_num <= len(self):
+            raise KeyError(leaf_num)
+        if leaf_num not in self._axes:
+            self._axes[leaf_num] = Leaf_Axis(actual=self._mlc.actual[leaf_num - 1],
+                                             expected=self._mlc.expected[leaf_num - 1])
+        return self._axes[leaf_num]
+
+    def __iter__(self):
+        return iter(range(1, len(self) + 1))
+
+    def __len__(self):
+        return self._mlc.num_leaves
 
 
 class MLC:
     """The MLC class holds MLC information and retrieves relevant data about the MLCs and positions."""
-    def __init__(self, snapshot_idx=None, jaw_struct=None, HDMLC=False):
+    def __init__(self, snapshot_idx=None, jaw_struct=None, HDMLC=False, actual=None, expected=None, dtype=np.float32):
         """
         Parameters
         ----------
@@ -1122,15 +2101,39 @@ class MLC:
         HDMLC : boolean
             If False (default), indicates a regular MLC model (e.g. Millennium 120).
             If True, indicates an HD MLC model (e.g. Millennium 120 HD).
+        actual : numpy.ndarray, optional
+            The actual leaf positions as a number of leaves-x-number of snapshots array. This is the fast way
+            to build an MLC; leaves can also be added one at a time with :meth:`add_leaf_axis`.
+        expected : numpy.ndarray, optional
+            The expected leaf positions; the same shape as ``actual``.
+
+            .. versionadded:: 0.8.0
+        dtype : numpy.dtype
+            The dtype the leaf positions are stored in; float32 by default.
+
+            .. versionadded:: 0.8.0
 
         Attributes
         ----------
-        leaf_axes : dict containing :class:`~pylinac.log_analyzer.Axis`
-            The dictionary is keyed by the leaf number, with the Axis as the value.
+        actual : numpy.ndarray
+            The actual positions of all the leaves as a contiguous array (float32 by default) of number of
+            leaves-x-number of snapshots. Row n holds leaf n+1.
+        expected : numpy.ndarray
+            The expected positions of all the leaves, like ``actual``.
+        leaf_axes : mapping of :class:`~pylinac.log_analyzer.Leaf_Axis`
+            The leaf axes keyed by the leaf number. Each Axis views its leaf's row of ``actual`` and ``expected``.
 
             .. warning:: Leaf numbers are 1-index based to correspond with Varian convention.
         """
-        self.leaf_axes = {}
+        if actual is None:
+            actual = expected = np.empty((0, 0))
+        elif np.shape(actual) != np.shape(expected):
+            raise ValueError("Actual and expected MLC positions are not the same shape")
+        self.actual = np.ascontiguousarray(actual, dtype=dtype)
+        self.expected = np.ascontiguousarray(expected, dtype=dtype)
+        # add_leaf_axis() grows these with spare rows; actual and expected view their first num_leaves rows
+        self._actual_buffer, self._expected_buffer = self.actual, self.expected
+        self.leaf_axes = _Leaf_Axes(self)
         self.snapshot_idx = snapshot_idx
         self._jaws = jaw_struct
         self.hdmlc = HDMLC
@@ -1143,10 +2146,9 @@ class MLC:
     @property
     def num_leaves(self):
         """Return the number of MLC leaves."""
-        return len(self.leaf_axes)
+        return len(self.actual)
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def num_snapshots(self):
         """Return the number of snapshots used for MLC RMS & Fluence calculations.
 
@@ -1156,27 +2158,40 @@ class MLC:
         """
         return len(self.snapshot_idx)
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def num_moving_leaves(self):
         """Return the number of leaves that moved."""
         return len(self.moving_leaves)
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def moving_leaves(self):
         """Return an array of the leaves that moved during treatment."""
+        return self._all_leaf_indices[self.leaves_moved]
+
+    @lazyproperty
+    def leaves_moved(self):
+        """A boolean array of whether each leaf moved during treatment; element n is leaf n+1.
+
+        .. versionadded:: 0.8.0
+        """
         threshold = 0.003
-        indices = ()
-        for leaf_num, leafdata in self.leaf_axes.items():
-            leaf_stdev = np.std(leafdata.actual[self.snapshot_idx])
-            if leaf_stdev > threshold:
-                indices += (leaf_num,)
-        return np.array(indices)
+        leaf_stdevs = np.std(self._snapshot_array('actual'), axis=1, dtype=float)
+        return leaf_stdevs > threshold
+
+    @lazyproperty
+    def pairs_moved(self):
+        """A boolean array of whether either leaf of each pair moved during treatment; element n is pair n+1.
+
+        .. versionadded:: 0.8.0
+        """
+        return self.leaves_moved[:self.num_pairs] | self.leaves_moved[self.num_pairs:2 * self.num_pairs]
 
     @type_accept(leaf_axis=Leaf_Axis, leaf_num=int)
     def add_leaf_axis(self, leaf_axis, leaf_num):
-        """Add a leaf axis to the MLC data structure.
+        """Add a leaf axis to the MLC data structure. Its positions are copied into the MLC position arrays.
+
+        The position arrays grow geometrically so adding leaves one at a time takes linear time overall,
+        but passing all the positions at once as ``actual`` and ``expected`` to the constructor is faster.
 
         Parameters
         ----------
@@ -1187,7 +2202,26 @@ class MLC:
 
             .. warning:: Leaf numbers are 1-index based to correspond with Varian convention.
         """
-        self.leaf_axes[leaf_num] = leaf_axis
+        if leaf_num < 1:
+            raise ValueError("Leaf numbers start at 1")
+        num_values = len(leaf_axis.actual)
+        if self.num_leaves and self.actual.shape[1] != num_values:
+            raise ValueError("Leaf axis does not have the same number of snapshots as the other leaves")
+        if leaf_num > self.num_leaves:
+            if leaf_num > len(self._actual_buffer) or self._actual_buffer.shape[1] != num_values:
+                capacity = max(leaf_num, 2 * self.num_leaves)
+                actual = np.zeros((capacity, num_values), dtype=self.actual.dtype)
+                expected = np.zeros((capacity, num_values), dtype=self.actual.dtype)
+                if self.num_leaves:
+                    actual[:self.num_leaves] = self.actual
+                    expected[:self.num_leaves] = self.expected
+                self._actual_buffer, self._expected_buffer = actual, expected
+            self.actual = self._actual_buffer[:leaf_num]
+            self.expected = self._expected_buffer[:leaf_num]
+        self.actual[leaf_num - 1] = leaf_axis.actual
+        self.expected[leaf_num - 1] = leaf_axis.expected
+        self.leaf_axes = _Leaf_Axes(self)
+        clear_caches(self)
 
     def leaf_moved(self, leaf_num):
         """Return whether the given leaf moved during treatment.
@@ -1199,10 +2233,7 @@ class MLC:
 
         .. warning:: Leaf numbers are 1-index based to correspond with Varian convention.
         """
-        if leaf_num in self.moving_leaves:
-            return True
-        else:
-            return False
+        return 1 <= leaf_num <= self.num_leaves and bool(self.leaves_moved[leaf_num - 1])
 
     def pair_moved(self, pair_num):
         """Return whether the given pair moved during treatment.
@@ -1216,18 +2247,12 @@ class MLC:
 
         .. warning:: Pair numbers are 1-index based to correspond with Varian convention.
         """
-        a_leaf = pair_num
-        b_leaf = pair_num + self.num_pairs
-        if self.leaf_moved(a_leaf) or self.leaf_moved(b_leaf):
-            return True
-        else:
-            return False
+        return 1 <= pair_num <= self.num_pairs and bool(self.pairs_moved[pair_num - 1])
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def _all_leaf_indices(self):
         """Return an array enumerated over all the leaves."""
-        return np.array(range(1, len(self.leaf_axes) + 1))
+        return np.arange(1, self.num_leaves + 1)
 
     def get_RMS_avg(self, bank='both', only_moving_leaves=False):
         """Return the overall average RMS of given leaves.
@@ -1249,9 +2274,7 @@ class MLC:
         -------
         float
         """
-        leaves = self.get_leaves(bank, only_moving_leaves)
-        rms_array = self.create_RMS_array(leaves)
-        return np.mean(rms_array)
+        return np.mean(self._RMS_array_all_leaves[self._leaf_mask(bank, only_moving_leaves)])
 
     def get_RMS_max(self, bank='both'):
         """Return the overall maximum RMS of given leaves.
@@ -1265,9 +2288,7 @@ class MLC:
         -------
         float
         """
-        leaves = self.get_leaves(bank)
-        rms_array = self.create_RMS_array(leaves)
-        return np.max(rms_array)
+        return np.max(self._RMS_array_all_leaves[self._leaf_mask(bank)])
 
     def get_RMS_percentile(self, percentile=95, bank='both', only_moving_leaves=False):
         """Return the n-th percentile value of RMS for the given leaves.
@@ -1287,9 +2308,7 @@ class MLC:
                 have an error of 0 and will drive down the average values. Convention would include all leaves,
                 but prudence would use only the moving leaves to get a more accurate assessment of error/RMS.
         """
-        leaves = self.get_leaves(bank, only_moving_leaves)
-        rms_array = self.create_RMS_array(leaves)
-        return np.percentile(rms_array, percentile)
+        return np.percentile(self._RMS_array_all_leaves[self._leaf_mask(bank, only_moving_leaves)], percentile)
 
     def get_RMS(self, leaves_or_bank):
         """Return an array of leaf RMSs for the given leaves or MLC bank.
@@ -1323,20 +2342,24 @@ class MLC:
             If False (default), include all the leaves.
             If True, will remove the leaves that were static during treatment.
         """
+        return self._all_leaf_indices[self._leaf_mask(bank, only_moving_leaves)]
+
+    def _leaf_mask(self, bank='both', only_moving_leaves=False):
+        """Return a boolean array selecting the leaves that match the given conditions; see :meth:`get_leaves`."""
         # get all leaves or only the moving leaves
         if only_moving_leaves:
-            leaves = copy.copy(self.moving_leaves)
+            mask = self.leaves_moved.copy()
         else:
-            leaves = copy.copy(self._all_leaf_indices)
+            mask = np.ones(self.num_leaves, dtype=bool)
 
         # select leaves by bank if desired
         if bank is not None:
             if bank.lower() == 'a':
-                leaves = leaves[leaves <= self.num_pairs]
+                mask[self.num_pairs:] = False
             elif bank.lower() == 'b':
-                leaves = leaves[leaves > self.num_pairs]
+                mask[:self.num_pairs] = False
 
-        return leaves
+        return mask
 
     def get_error_percentile(self, percentile=95, bank='both', only_moving_leaves=False):
         """Calculate the n-th percentile error of the leaf error.
@@ -1356,12 +2379,7 @@ class MLC:
                 have an error of 0 and will drive down the average values. Convention would include all leaves,
                 but prudence would use only the moving leaves to get a more accurate assessment of error/RMS.
         """
-        leaves = self.get_leaves(bank, only_moving_leaves)
-        leaves -= 1
-        error_array = self.create_error_array(leaves)
-
-        abs_error = np.abs(error_array)
-        return np.percentile(abs_error, percentile)
+        return np.percentile(self._abs_error_all_leaves[self._leaf_mask(bank, only_moving_leaves)], percentile)
 
     def create_error_array(self, leaves, absolute=True):
         """Create and return an error array of only the leaves specified.
@@ -1402,36 +2420,42 @@ class MLC:
         leaves -= 1
         return rms_array[leaves]
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def _abs_error_all_leaves(self):
         """Absolute error of all leaves."""
         return np.abs(self._error_array_all_leaves)
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def _error_array_all_leaves(self):
         """Error array of all leaves."""
-        mlc_error = np.zeros((self.num_leaves, self.num_snapshots))
-        # construct numpy array for easy array calculation
-        for leaf in range(self.num_leaves):
-            mlc_error[leaf, :] = self.leaf_axes[leaf+1].difference[self.snapshot_idx]
-        return mlc_error
-
+        return self._snapshot_array('actual') - self._snapshot_array('expected')
+
+    @lazyproperty
+    def _snapshot_selection(self):
+        """The snapshot indices as a slice if they're a contiguous run, so the snapshot data of all leaves is a
+        view rather than a copy; otherwise the indices themselves."""
+        idx = np.asarray(self.snapshot_idx)
+        if len(idx) and np.array_equal(idx, np.arange(idx[0], idx[0] + len(idx))):
+            return slice(int(idx[0]), int(idx[0]) + len(idx))
+        return idx
+
+    @lazyproperty
+    def _actual_snapshots(self):
+        return self.actual[:, self._snapshot_selection]
+
+    @lazyproperty
+    def _expected_snapshots(self):
+        return self.expected[:, self._snapshot_selection]
+
+    @value_accept(dtype=('actual', 'expected'))
     def _snapshot_array(self, dtype='actual'):
         """Return an array of the snapshot data of all leaves."""
-        arr = np.zeros((self.num_leaves, self.num_snapshots))
-        # construct numpy array for easy array calculation
-        for leaf in range(self.num_leaves):
-            arr[leaf, :] = getattr(self.leaf_axes[leaf + 1], dtype)[self.snapshot_idx]
-        return arr
+        return getattr(self, '_' + dtype + '_snapshots')
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def _RMS_array_all_leaves(self):
         """Return the RMS of all leaves."""
-        rms_array = np.array([np.sqrt(np.sum(leafdata.difference[self.snapshot_idx] ** 2) / self.num_snapshots) for leafdata in self.leaf_axes.values()])
-        return rms_array
+        return np.sqrt(np.sum(np.square(self._error_array_all_leaves, dtype=float), axis=1) / self.num_snapshots)
 
     def leaf_under_y_jaw(self, leaf_num):
         """Return a boolean specifying if the given leaf is under one of the y jaws.
@@ -1440,6 +2464,20 @@ class MLC:
         ----------
         leaf_num : int
         """
+        return bool(self._leaves_under_y_jaw[leaf_num - 1])
+
+    @lazyproperty
+    def pairs_under_y_jaw(self):
+        """A boolean array of whether each leaf pair is fully under one of the y jaws at its widest opening;
+        element n is pair n+1.
+
+        .. versionadded:: 0.8.0
+        """
+        return self._leaves_under_y_jaw[:self.num_pairs]
+
+    @lazyproperty
+    def _leaves_under_y_jaw(self):
+        """A boolean array of whether each leaf is under one of the y jaws."""
         outer_leaf_thickness = 10  # mm
         inner_leaf_thickness = 5
         mlc_position = 0
@@ -1447,26 +2485,15 @@ class MLC:
             outer_leaf_thickness /= 2
             inner_leaf_thickness /= 2
             mlc_position = 100
-        for leaf in range(1, leaf_num+1):
-            if 10 >= leaf or leaf >= 110:
-                mlc_position += outer_leaf_thickness
-            elif 50 >= leaf or leaf >= 70:
-                mlc_position += inner_leaf_thickness
-            else:  # between 50 and 70
-                mlc_position += outer_leaf_thickness
+        leaves = self._all_leaf_indices
+        thickness = np.where((leaves <= 10) | (leaves >= 110), outer_leaf_thickness,
+                             np.where((leaves <= 50) | (leaves >= 70), inner_leaf_thickness, outer_leaf_thickness))
+        # the position of the far edge of each leaf
+        mlc_positions = mlc_position + np.cumsum(thickness)
 
         y2_position = self._jaws.y2.actual.max()*10 + 200
         y1_position = 200 - self._jaws.y1.actual.max()*10
-        if 10 >= leaf or leaf >= 110:
-            thickness = outer_leaf_thickness
-        elif 50 >= leaf or leaf >= 70:
-            thickness= inner_leaf_thickness
-        else:  # between 50 and 70
-            thickness = outer_leaf_thickness
-        if mlc_position < y1_position or mlc_position - thickness > y2_position:
-            return True
-        else:
-            return False
+        return (mlc_positions < y1_position) | (mlc_positions - thickness > y2_position)
 
     def get_snapshot_values(self, bank_or_leaf='both', dtype='actual'):
         """Retrieve the snapshot data of the given MLC bank or leaf/leaves
@@ -1587,8 +2614,8 @@ class TLog_Section(Log_Section, metaclass=ABCMeta):
 
         Parameters
         ----------
-        filecontents : file object
-            The complete file having been read with .read().
+        filecontents : bytes, buffer
+            The complete file contents, e.g. read with .read() or from :func:`map_file`.
         dtype : int, float, str
             The expected data type to return. If int or float, will return numpy array.
         num_values : int
@@ -1627,6 +2654,26 @@ class TLog_Section(Log_Section, metaclass=ABCMeta):
         self._cursor += cursor_shift  # shift cursor if need be (e.g. if a reserved section follows)
         return output
 
+    def _decode_array(self, filecontents, dtype, shape):
+        """Return a block of binary data as a numpy array without copying it.
+
+        Unlike :meth:`_decode_binary`, the values are not unpacked into Python objects; the array is a view
+        of ``filecontents``, which should be a buffer such as one returned by :func:`map_file`.
+
+        Parameters
+        ----------
+        filecontents : buffer
+            The complete file contents, e.g. a memory-mapped file.
+        dtype : numpy.dtype
+            The data type of the values as stored in the file.
+        shape : tuple
+            The shape of the returned array.
+        """
+        count = int(np.prod(shape))
+        output = np.frombuffer(filecontents, dtype=dtype, count=count, offset=self._cursor).reshape(shape)
+        self._cursor += output.nbytes
+        return output
+
 
 class Subbeam(TLog_Section):
     """Data structure for trajectory log "subbeams". Only applicable for auto-sequenced beams.
@@ -1663,6 +2710,15 @@ class Subbeam(TLog_Section):
 
         return self, self._cursor
 
+    @property
+    def snapshots(self):
+        """A boolean array of the log snapshots of the subbeam where the beam was on. It can be passed as the
+        ``snapshots`` of fluence and gamma calculations to analyze the subbeam alone.
+
+        .. versionadded:: 0.8.0
+        """
+        return self._snapshots
+
     @property
     def gantry_angle(self):
         return self._get_metadata_axis('gantry')
@@ -1866,14 +2922,28 @@ class Dlog_Axis_Data(DLog_Section):
     mlc : :class:`~pylinac.log_analyzer.MLC`
         MLC data structure. Data in cm.
     """
-    def __init__(self, log_content, header, bfile):
+    def __init__(self, log_content, header, bfile, dtype=None):
+        """
+        Parameters
+        ----------
+        log_content : str
+            The path to the A-file.
+        header : Dlog_Header
+        bfile : str
+            The path to the B-file.
+        dtype : numpy.dtype, None
+            The dtype of the axis data and MLC positions. If None, the axis data is float64 and the MLC positions
+            float32.
+        """
         super().__init__(log_content)
         self._header = header
         self._bfile = bfile
+        self._dtype = dtype
 
     def _read(self, exclude_beam_off):
         """Read the dynalog axis data."""
-        matrix = np.array([line for line in self._log_content], dtype=float)
+        dtype, mlc_dtype = (float, np.float32) if self._dtype is None else (self._dtype, self._dtype)
+        matrix = read_dlog_snapshots(self._log_content, dtype)
 
         self.num_snapshots = np.size(matrix, 0)
 
@@ -1907,34 +2977,27 @@ class Dlog_Axis_Data(DLog_Section):
         else:
             snapshots = list(range(self.num_snapshots))
 
-        self.mlc = MLC(snapshots, self.jaws)
-        for leaf in range(1, (self._header.num_mlc_leaves // 2) + 1):
-            axis = Leaf_Axis(expected=matrix[:, (leaf-1)*4+14], actual=matrix[:, (leaf-1)*4+15])
-            self.mlc.add_leaf_axis(axis, leaf)
-
         # read in "B"-file to get bank B MLC positions. The file must be in the same folder as the "A"-file.
         # The header info is repeated but we already have that.
-        with open(self._bfile) as csvf:
-            dlgdata = csv.reader(csvf, delimiter=',')
-            matrix = np.array([line for line in dlgdata if int(dlgdata.line_num) >= 7], dtype=float)
-
-        # Add bank B MLC positions to mlc snapshot arrays
-        for leaf in range(1, (self._header.num_mlc_leaves // 2) + 1):
-            axis = Leaf_Axis(expected=matrix[:, (leaf-1)*4 + 14], actual=matrix[:, (leaf-1)*4 + 15])
-            self.mlc.add_leaf_axis(axis, leaf+self._header.num_mlc_leaves//2)
-
-        self._scale_dlog_mlc_pos()
+        bmatrix = read_dlog_snapshots(self._bfile, dtype)
+
+        # each leaf has 4 columns, starting with its expected then actual position; bank A is followed by bank B
+        num_pairs = self._header.num_mlc_leaves // 2
+        leaf_cols = slice(14, 14 + num_pairs * 4, 4)
+        expected = np.concatenate((matrix[:, leaf_cols], bmatrix[:, leaf_cols]), axis=1).T
+        leaf_cols = slice(15, 15 + num_pairs * 4, 4)
+        actual = np.concatenate((matrix[:, leaf_cols], bmatrix[:, leaf_cols]), axis=1).T
+        self.mlc = MLC(snapshots, self.jaws, actual=self._scale_dlog_mlc_pos(actual),
+                       expected=self._scale_dlog_mlc_pos(expected), dtype=mlc_dtype)
         return self
 
-    def _scale_dlog_mlc_pos(self):
+    @staticmethod
+    def _scale_dlog_mlc_pos(positions):
         """Convert MLC leaf plane positions to isoplane positions and from 100ths of mm to cm."""
         dynalog_leaf_conversion = 1.96614  # MLC physical plane scaling factor to iso (100cm SAD) plane
-        for leaf in range(1, self.mlc.num_leaves + 1):
-            self.mlc.leaf_axes[leaf].actual *= dynalog_leaf_conversion / 1000
-            self.mlc.leaf_axes[leaf].expected *= dynalog_leaf_conversion / 1000
+        return positions * (dynalog_leaf_conversion / 1000)
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def num_beamholds(self):
         """Return the number of times the beam was held."""
         diffmatrix = np.diff(self.beam_hold.actual)
@@ -1974,19 +3037,20 @@ class Tlog_Axis_Data(TLog_Section):
     mlc : :class:`~pylinac.log_analyzer.MLC`
         MLC data structure; data in cm.
     """
-    def __init__(self, log_content, cursor, header):
+    def __init__(self, log_content, cursor, header, dtype=None):
         super().__init__(log_content, cursor)
         self._header = header
+        self._dtype = dtype  # None keeps the data in the float32 it's stored in
 
     def _read(self, exclude_beam_off):
-        # step size in bytes
+        # number of values per snapshot; each sample has an expected and actual value
         step_size = sum(self._header.samples_per_axis) * 2
 
-        # read in all snapshot data at once, then assign
-        snapshot_data = self._decode_binary(self._log_content, float, step_size * self._header.num_snapshots)
-
-        # reshape snapshot data to be a x-by-num_snapshots matrix
-        snapshot_data = snapshot_data.reshape(self._header.num_snapshots, -1)
+        # view all snapshot data at once as a num_snapshots-x-step_size float32 matrix, then assign.
+        # Axes are column views into this block; no snapshot data is copied unless another dtype is asked for.
+        snapshot_data = self._decode_array(self._log_content, np.float32, (self._header.num_snapshots, step_size))
+        if self._dtype is not None:
+            snapshot_data = snapshot_data.astype(self._dtype, copy=False)
 
         column = snapshot_col_gen()
 
@@ -2032,15 +3096,16 @@ class Tlog_Axis_Data(TLog_Section):
         else:
             hdmlc = True
 
-        self.mlc = MLC(snapshots, self.jaws, hdmlc)
-        for leaf_num in range(1, self._header.num_mlc_leaves+1):
-            leaf_axis = self._get_axis(snapshot_data, next(column), Leaf_Axis)
-            self.mlc.add_leaf_axis(leaf_axis, leaf_num)
+        # the leaf positions are copied out of the snapshot block into contiguous leaves-x-snapshots arrays
+        first_leaf_col = next(column)
+        last_leaf_col = first_leaf_col + self._header.num_mlc_leaves * 2
+        expected = snapshot_data[:, first_leaf_col:last_leaf_col:2].T
+        actual = snapshot_data[:, first_leaf_col + 1:last_leaf_col:2].T
+        self.mlc = MLC(snapshots, self.jaws, hdmlc, actual=actual, expected=expected, dtype=snapshot_data.dtype)
 
         return self, self._cursor
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def num_beamholds(self):
         """Return the number of times the beam was held."""
         diffmatrix = np.diff(self.beam_hold.actual)
@@ -2078,6 +3143,377 @@ class CRC(TLog_Section):
         # TODO: figure this out
         pass
 
+@cached_analysis()
+def _analyze_log(log, doseTA, distTA, threshold, resolution):
+    """Calculate the gamma of a log and return its summary as a row of :data:`log_results_dtype`."""
+    log.fluence.gamma.calc_map(doseTA, distTA, threshold, resolution)
+    mlc = log.axis_data.mlc
+    return (log.fluence.gamma.avg_gamma, log.fluence.gamma.pass_prcnt, mlc.get_RMS_avg(), mlc.get_RMS_max(),
+            log.axis_data.num_beamholds)
+
+def _analyze_log_file(filename, exclude_beam_off, dtype, gamma_params):
+    """Load and analyze a log file; used by process pool workers, which cannot be sent loaded logs cheaply."""
+    # the axis data is only read if the results aren't in the analysis cache
+    log = MachineLog(filename, exclude_beam_off, header_only=True, dtype=dtype)
+    return _analyze_log(log, *gamma_params)
+
+def write_columnar(logs, filename):
+    """Write the axis and leaf data of one or many logs to a single columnar dataset.
+
+    Each row is a snapshot. The columns are ``log_id`` (the index of the log in ``logs``), ``snapshot``, and the
+    expected and actual values of each axis and leaf, e.g. ``gantry_actual`` or ``leaf_61_expected``, as float32.
+    Values an axis doesn't have (e.g. the expected gantry angle of a dynalog or the couch of a dynalog) are NaN.
+    Logs are written one at a time, so ``logs`` may be a generator such as
+    :meth:`~pylinac.log_analyzer.MachineLogs.iter_folder` and memory stays bounded by a single log.
+
+    .. versionadded:: 0.8.0
+
+    Parameters
+    ----------
+    logs : iterable of :class:`~pylinac.log_analyzer.MachineLog`
+        The logs to write. All logs must have the same number of leaves.
+    filename : str
+        The file to write to. The format is determined by the extension:
+
+        * ``.npz`` -- a numpy archive of one array per column plus a ``filenames`` array indexed by ``log_id``.
+        * ``.parquet`` -- a Parquet file with one row group per log and a ``filename`` column. Requires pyarrow.
+        * ``.arrow`` -- an Arrow IPC file with one record batch per log and a ``filename`` column. Requires pyarrow.
+    """
+    extension = osp.splitext(filename)[1].lower()
+    if extension == '.npz':
+        _write_npz(logs, filename)
+    elif extension in ('.parquet', '.arrow'):
+        _write_arrow(logs, filename, extension)
+    else:
+        raise ValueError("Columnar exports must be .npz, .parquet, or .arrow files")
+
+def _columnar_table(log, log_id, num_leaves=None):
+    """Return the columns of a log's data as an ordered dict of equal-length arrays."""
+    axis_data = log.axis_data
+    if num_leaves is not None and axis_data.mlc.num_leaves != num_leaves:
+        raise ValueError("All logs must have the same number of leaves to be written to the same dataset")
+    num_snapshots = len(axis_data.mu.actual)
+    table = OrderedDict()
+    table['log_id'] = np.full(num_snapshots, log_id, dtype=np.int32)
+    table['snapshot'] = np.arange(num_snapshots, dtype=np.int32)
+    axes = []
+    for name, attrs in columnar_axes:
+        axis = axis_data
+        for attr in attrs:
+            axis = getattr(axis, attr, None)
+        axes.append((name, axis))
+    axes += [('leaf_' + str(leaf_num), leaf) for leaf_num, leaf in sorted(axis_data.mlc.leaf_axes.items())]
+    for name, axis in axes:
+        for value_type in ('expected', 'actual'):
+            values = getattr(axis, value_type, None)
+            if values is None:
+                values = np.full(num_snapshots, np.nan)
+            table[name + '_' + value_type] = np.asarray(values, dtype=np.float32)
+    return table
+
+def _write_npz(logs, filename):
+    """Write logs to a .npz file. Each column is accumulated in a temporary file one log at a time, then
+    copied into the archive, so no more than one log is held in memory."""
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        columns = OrderedDict()
+        filenames = []
+        num_rows = 0
+        num_leaves = None
+        for log_id, log in enumerate(logs):
+            table = _columnar_table(log, log_id, num_leaves)
+            num_leaves = log.axis_data.mlc.num_leaves
+            for column_num, (name, values) in enumerate(table.items()):
+                columns[name] = values.dtype
+                with open(osp.join(tmp_dir, str(column_num)), 'ab') as column_file:
+                    values.tofile(column_file)
+            num_rows += len(table['log_id'])
+            filenames.append(str(log._filename_str))
+        if not filenames:
+            raise ValueError("No logs to write")
+
+        with zipfile.ZipFile(filename, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for column_num, (name, dtype) in enumerate(columns.items()):
+                with archive.open(name + '.npy', 'w', force_zip64=True) as member:
+                    header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (num_rows,)}
+                    np.lib.format.write_array_header_1_0(member, header)
+                    with open(osp.join(tmp_dir, str(column_num)), 'rb') as column_file:
+                        shutil.copyfileobj(column_file, member)
+            with archive.open('filenames.npy', 'w') as member:
+                np.lib.format.write_array(member, np.array(filenames))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+def _write_arrow(logs, filename, extension):
+    """Write logs to a Parquet or Arrow IPC file, one row group/record batch per log."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow is not installed; cannot write Parquet or Arrow files. Use a .npz file instead")
+    writer = None
+    num_leaves = None
+    try:
+        for log_id, log in enumerate(logs):
+            table = _columnar_table(log, log_id, num_leaves)
+            num_leaves = log.axis_data.mlc.num_leaves
+            arrays = [pa.array(values) for values in table.values()]
+            names = list(table.keys())
+            # a plain string column; an IPC file can't have a different dictionary in each record batch
+            arrays.insert(1, pa.array([str(log._filename_str)] * len(table['log_id']), type=pa.string()))
+            names.insert(1, 'filename')
+            batch = pa.Table.from_arrays(arrays, names=names)
+            if writer is None:
+                if extension == '.parquet':
+                    writer = pq.ParquetWriter(filename, batch.schema)
+                else:
+                    writer = pa.ipc.new_file(filename, batch.schema)
+            writer.write_table(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError("No logs to write")
+
+def write_synthetic_tlog(filename, num_snapshots=1000, num_leaves=120, version=2.1, mlc_model=2, num_subbeams=1,
+                         leaf_error=0, leaf_offset=0, num_beam_holds=0, hold_length=10, txt_file=True, seed=None):
+    """Write a synthetic trajectory log of a sliding-window delivery, e.g. for load and scale testing.
+
+    The leaf pairs sweep across a 20x20cm field while the gantry rotates once. Errors can be injected into the
+    actual leaf positions, and the beam held; during a hold the MU and the leaves don't advance. The log can be loaded
+    with :class:`~pylinac.log_analyzer.MachineLog`.
+
+    .. versionadded:: 0.8.0
+
+    Parameters
+    ----------
+    filename : str
+        The path of the .bin file to write.
+    num_snapshots : int
+        The number of snapshots; the log is sampled every 20ms.
+    num_leaves : int
+        The number of leaves; must be even.
+    version : {2.1, 3.0}
+        The log version. Version 3.0 logs have couch roll and pitch axes and 512-byte subbeam names.
+    mlc_model : {2, 3}
+        The MLC model; 2 is a Millennium MLC, 3 an HD MLC.
+    num_subbeams : int
+        The number of subbeams; each delivers an equal share of the control points and MU.
+    leaf_error : float
+        The standard deviation in cm of a random error added to the actual leaf positions.
+    leaf_offset : float
+        A systematic error in cm added to the actual leaf positions; positive values open the leaves.
+    num_beam_holds : int
+        The number of beam holds, spread evenly over the delivery.
+    hold_length : int
+        The number of snapshots each beam hold lasts.
+    txt_file : bool
+        If True (default), the .txt file of the log is written beside it.
+    seed : int, None
+        The seed of the random leaf errors.
+
+    Returns
+    -------
+    str
+        The filename of the log.
+    """
+    if version >= 3:
+        scalar_axes = list(range(12))  # collimator, gantry, jaws, and couch vert, long, lat, rotation, roll, pitch
+        name_size = 512
+    else:
+        scalar_axes = list(range(10))
+        name_size = 32
+    num_control_points = 10 * num_subbeams + 1
+    delivery = _synthetic_delivery(num_snapshots, num_leaves, num_control_points, leaf_error, leaf_offset,
+                                   num_beam_holds, hold_length, seed)
+    mu_total = 100 * num_subbeams
+
+    # header
+    axis_enum = scalar_axes + [40, 41, 42, 50]  # MU, beam hold, control point, and MLC
+    samples_per_axis = [1] * (len(axis_enum) - 1) + [num_leaves + 2]  # the MLC axis includes the 2 carriages
+    header = struct.pack('16s16s3i', b'VOSTL', '{:.1f}'.format(version).encode(), TLOG_HEADER_SIZE, 20, len(axis_enum))
+    header += struct.pack('{}i'.format(len(axis_enum) * 2), *(axis_enum + samples_per_axis))
+    header += struct.pack('5i', 1, num_subbeams, 0, num_snapshots, mlc_model)
+    header = header.ljust(TLOG_HEADER_SIZE, b'\x00')
+
+    # subbeams: control point, MU, radiation time, sequence number, beam name, and a reserved section
+    rad_time = num_snapshots * 0.02 / num_subbeams
+    for sequence_num in range(num_subbeams):
+        beam_name = 'Field {}'.format(sequence_num + 1).encode()
+        header += struct.pack('iffi{}s32s'.format(name_size), sequence_num * 10, mu_total / num_subbeams, rad_time,
+                              sequence_num, beam_name, b'')
+
+    # snapshots; each axis sample is an expected and actual value
+    progress = delivery['progress']
+    axes = [0, (180 + 360 * progress) % 360, 10, 10, 10, 10] + [0] * (len(scalar_axes) - 6)
+    axes += [progress * mu_total, delivery['beam_hold'] * 2, delivery['control_point'], 15, 15]  # then the carriages
+    snapshot_data = np.empty((num_snapshots, sum(samples_per_axis) * 2), dtype=np.float32)
+    for col, values in enumerate(axes):
+        snapshot_data[:, col * 2] = values
+        snapshot_data[:, col * 2 + 1] = values
+    first_leaf_col = len(axes) * 2
+    snapshot_data[:, first_leaf_col::2] = delivery['expected'].T
+    snapshot_data[:, first_leaf_col + 1::2] = delivery['actual'].T
+
+    with open(filename, 'wb') as f:
+        f.write(header)
+        snapshot_data.tofile(f)
+        # a CRC-16-CCITT of the log seeded with 0xFFFF
+        crc = binascii.crc_hqx(snapshot_data.data, binascii.crc_hqx(header, 0xFFFF))
+        f.write(struct.pack('H', crc))
+
+    if txt_file:
+        txt = OrderedDict((
+            ('Patient ID', 'pylinac'), ('Plan Name', 'Synthetic'), ('Plan UID', '1.2.3.4'), ('Beam Number ', 1),
+            ('Beam Name ', 'Field 1'), ('Original MU ', mu_total), ('Logging Scale ', 'IEC'),
+            ('X1 (Cms)', '10.00'), ('X2 (Cms)', '10.00'), ('Y1 (Cms)', '10.00'), ('Y2 (Cms)', '10.00'),
+            ('Energy ', '6x'), ('Radiation Time (mins)', '{:.4f}'.format(rad_time * num_subbeams / 60)),
+        ))
+        with open(filename.replace('.bin', '.txt'), 'w') as f:
+            f.write('\n'.join('{}:\t{}'.format(key, value) for key, value in txt.items()) + '\n')
+    return filename
+
+def write_synthetic_dlog(filename, num_snapshots=1000, num_leaves=120, leaf_error=0, leaf_offset=0, num_beam_holds=0,
+                         hold_length=10, seed=None):
+    """Write a synthetic A/B dynalog pair of a sliding-window delivery, e.g. for load and scale testing.
+
+    The delivery is the same as that of :func:`write_synthetic_tlog`. The logs can be loaded with
+    :class:`~pylinac.log_analyzer.MachineLog`.
+
+    .. versionadded:: 0.8.0
+
+    Parameters
+    ----------
+    filename : str
+        The path of the A-file to write, e.g. "A1.dlg"; the B-file is written beside it.
+    num_snapshots : int
+        The number of snapshots.
+    num_leaves : int
+        The number of leaves; must be even.
+    leaf_error : float
+        The standard deviation in cm of a random error added to the actual leaf positions.
+    leaf_offset : float
+        A systematic error in cm added to the actual leaf positions; positive values open the leaves.
+    num_beam_holds : int
+        The number of beam holds, spread evenly over the delivery.
+    hold_length : int
+        The number of snapshots each beam hold lasts.
+    seed : int, None
+        The seed of the random leaf errors.
+
+    Returns
+    -------
+    str, str
+        The filenames of the A- and B-file.
+    """
+    dlg_dir, dlg_file = osp.split(filename)
+    if not dlg_file.startswith('A'):
+        raise ValueError("The A-file name must start with 'A'")
+    b_filename = osp.join(dlg_dir, 'B' + dlg_file[1:])
+    num_control_points = 11
+    delivery = _synthetic_delivery(num_snapshots, num_leaves, num_control_points, leaf_error, leaf_offset,
+                                   num_beam_holds, hold_length, seed)
+    num_pairs = num_leaves // 2
+
+    # dose fraction, previous segment, beam hold, beam on, prior & next dose index, gantry and collimator in 0.1deg,
+    # jaws in mm, and carriages in 100ths of mm; see Dlog_Axis_Data._read()
+    progress = delivery['progress']
+    axes = [np.round(progress * 25000), delivery['control_point'], delivery['beam_hold'], 1, 0, 25000,
+            np.round((180 + 360 * progress) % 360 * 10), 0, 100, 100, 100, 100, 15000, 15000]
+    axis_data = np.empty((num_snapshots, len(axes)), dtype=np.int64)
+    for col, values in enumerate(axes):
+        axis_data[:, col] = values
+    # leaves are in 100ths of mm in the leaf plane; each has its expected, actual, previous expected and previous
+    # actual positions
+    expected, actual = (np.round(delivery[positions] * 1000 / 1.96614) for positions in ('expected', 'actual'))
+
+    header = ['B', 'pylinac,,Synthetic', '1.2.3.4,1', '0', str(num_pairs), '1']
+    for dlg_filename, bank in ((filename, slice(0, num_pairs)), (b_filename, slice(num_pairs, None))):
+        leaf_data = np.empty((num_snapshots, num_pairs * 4), dtype=np.int64)
+        for col, positions in enumerate((expected, actual, expected, actual)):
+            leaf_data[:, col::4] = positions[bank].T
+        with open(dlg_filename, 'w') as f:
+            f.write('\n'.join(header) + '\n')
+            np.savetxt(f, np.hstack((axis_data, leaf_data)), fmt='%d', delimiter=',')
+    return filename, b_filename
+
+def _synthetic_delivery(num_snapshots, num_leaves, num_control_points, leaf_error, leaf_offset, num_beam_holds,
+                        hold_length, seed):
+    """Return the snapshot data of a synthetic sliding-window delivery as a dict of arrays.
+
+    ``progress`` is the fraction of the delivery done at each snapshot, which doesn't advance while the beam is held.
+    Leaf positions are in cm, leaves-x-snapshots, bank A followed by bank B."""
+    if num_leaves <= 0 or num_leaves % 2:
+        raise ValueError("The number of leaves must be a positive even number")
+    if num_snapshots < 2:
+        raise ValueError("A log must have at least 2 snapshots")
+    if num_beam_holds * hold_length >= num_snapshots:
+        raise ValueError("The beam holds must be shorter than the delivery")
+    beam_hold = np.zeros(num_snapshots, dtype=int)
+    for start in np.linspace(0, num_snapshots, num_beam_holds + 2)[1:-1].astype(int):
+        beam_hold[start:start + hold_length] = 1
+    progress = np.cumsum(beam_hold == 0) - 1
+    progress = progress / progress[-1]
+
+    pairs = np.arange(num_leaves // 2)[:, np.newaxis]
+    centers = -8 + 16 * progress + 0.5 * np.sin(pairs / 5 + 20 * progress)
+    gaps = 1 + 0.5 * np.sin(pairs / 10)
+    expected = np.vstack((gaps / 2 - centers, gaps / 2 + centers))
+    actual = expected + leaf_offset
+    if leaf_error:
+        actual += np.random.RandomState(seed).normal(scale=leaf_error, size=actual.shape)
+    return {'progress': progress, 'beam_hold': beam_hold, 'expected': expected, 'actual': actual,
+            'control_point': np.floor(progress * (num_control_points - 1))}
+
+def read_dlog_snapshots(dlg_filename, dtype=float):
+    """Read the snapshot data of a dynalog file.
+
+    The numeric body of the file is parsed in one pass by numpy rather than row by row.
+
+    .. versionadded:: 0.8.0
+
+    Parameters
+    ----------
+    dlg_filename : str
+        The path to the A- or B-file.
+    dtype : numpy.dtype
+        The dtype of the array; float64 by default. Dynalog values are integers small enough to be exact in float32.
+
+    Returns
+    -------
+    numpy.ndarray
+        A num_snapshots-x-num_columns array.
+    """
+    with open(dlg_filename) as dlgf:
+        content = dlgf.read().split('\n', DLOG_HEADER_ROWS)
+    if len(content) <= DLOG_HEADER_ROWS:
+        raise ValueError("{} has no snapshot data".format(dlg_filename))
+    body = content[-1].strip()
+    num_lines = body.count('\n') + 1
+    num_columns = body.split('\n', 1)[0].count(',') + 1
+    # every snapshot is a line of comma-separated values, so joining the lines gives one long comma-separated string.
+    # Parsing stops at the first value that isn't a number, so the values are counted to catch malformed snapshots
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        matrix = np.fromstring(body.replace('\n', ','), dtype=dtype, sep=',')
+    if matrix.size != num_lines * num_columns:
+        raise ValueError("{} has malformed or unequal length snapshots".format(dlg_filename))
+    return matrix.reshape(num_lines, num_columns)
+
+def map_file(filename):
+    """Return the contents of a file as a buffer that numpy arrays can view without copying.
+
+    Files on disk are memory-mapped copy-on-write, so arrays viewing the buffer are writeable but changes never
+    reach the file. File objects (e.g. a log downloaded from a URL) are read into a bytearray.
+
+    .. versionadded:: 0.8.0
+    """
+    if isinstance(filename, str):
+        with open(filename, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    else:
+        return bytearray(open_file(filename).read())
+
 def is_tlog_txt_file_around(tlog_filename):
     """Boolean specifying if a Tlog *.txt file is available."""
     try:
@@ -2090,37 +3526,64 @@ def is_tlog_txt_file_around(tlog_filename):
         return False
 
 
+def sniff_log_type(filename):
+    """Return the log type of a file based on a sample of its first few bytes.
+
+    .. versionadded:: 0.8.0
+
+    Returns
+    -------
+    str, None
+        One of the :data:`log_types` values, or None if the file is not a log.
+    """
+    if not is_valid_file(filename, raise_error=False):
+        return
+    if isinstance(filename, str):
+        with open(filename, 'rb') as unknown_file:
+            header_sample = unknown_file.read(5)
+    else:
+        header_sample = open_file(filename).read(5)
+    if b'V' in header_sample:
+        return log_types['tlog']
+    elif b'B' in header_sample or b'A' in header_sample:
+        return log_types['dlog']
+
 def is_log(filename):
     """Boolean specifying if filename is a valid log file."""
-    if is_tlog(filename) or is_dlog(filename):
+    if sniff_log_type(filename) is not None:
         return True
     else:
         return False
 
 def is_tlog(filename):
     """Boolean specifying if filename is a Trajectory log file."""
-    if is_valid_file(filename, raise_error=False):
-        unknown_file = open_file(filename)
-        header_sample = unknown_file.read(5).decode()
-        if 'V' in header_sample:
-            return True
-        else:
-            return False
+    if sniff_log_type(filename) == log_types['tlog']:
+        return True
     else:
         return False
 
 def is_dlog(filename):
     """Boolean specifying if filename is a dynalog file."""
-    if is_valid_file(filename, raise_error=False):
-        unknown_file = open_file(filename)
-        header_sample = unknown_file.read(5).decode()
-        if 'B' in header_sample or 'A' in header_sample:
-            return True
-        else:
-            return False
+    if sniff_log_type(filename) == log_types['dlog']:
+        return True
     else:
         return False
 
+def tlog_data_size(header):
+    """Return the size in bytes a trajectory log must be to hold all the subbeams and snapshots its header declares,
+    excluding the trailing CRC.
+
+    .. versionadded:: 0.8.0
+
+    Parameters
+    ----------
+    header : Tlog_Header
+    """
+    # a subbeam is 4 4-byte values, then the beam name and 32 reserved bytes
+    subbeam_size = 16 + (512 if is_tlog_v3(header.version) else 32) + 32
+    snapshot_size = sum(header.samples_per_axis) * 2 * 4  # an expected and actual float32 per sample
+    return header.header_size + header.num_subbeams * subbeam_size + header.num_snapshots * snapshot_size
+
 def is_tlog_v3(version):
     """Return whether the Tlog version is 3 or not."""
     if version >= 3:
@@ -2,7 +2,6 @@
 """The picketfence module is used for loading and analyzing EPID images of a "picket fence", a common MLC
 pattern produced when performing linac QA."""
 import os.path as osp
-from functools import lru_cache
 from io import BytesIO
 
 import numpy as np
@@ -13,6 +12,8 @@ from pylinac.core.geometry import Line, Rectangle
 from pylinac.core.io import get_filepath_UI
 from pylinac.core.profile import Profile
 from pylinac.core.image import Image
+from pylinac.core.decorators import lazyproperty
+from pylinac.core.cache import cached_analysis
 
 orientations = {'UD': 'Up-Down', 'LR': 'Left-Right'}  # possible orientations of the pickets. UD is up-down, LR is left-right.
 
@@ -190,6 +191,10 @@ class PicketFence:
         path = get_filepath_UI()
         self.load_image(path, filter=filter)
 
+    def _cache_inputs(self):
+        """The data the analysis depends on, which keys the analysis cache; see :mod:`~pylinac.core.cache`."""
+        return getattr(self, 'image', None)
+
     def _check_for_noise(self):
         """Check if the image has extreme noise (dead pixel, etc) by comparing
         min/max to 1/99 percentiles and smoothing if need be."""
@@ -212,6 +217,7 @@ class PicketFence:
         print(self.return_results())
         self.plot_analyzed_image()
 
+    @cached_analysis(state=True)
     def analyze(self, tolerance=0.5, action_tolerance=None, hdmlc=False):
         """Analyze the picket fence image.
 
@@ -492,8 +498,7 @@ class Picket:
         """The max error of the MLC measurements."""
         return self._error_array.max()
 
-    @property
-    @lru_cache()
+    @lazyproperty
     def _error_array(self):
         err = []
         for meas in self.mlc_meas:
@@ -15,6 +15,7 @@ import matplotlib.pyplot as plt
 from scipy.optimize import differential_evolution
 
 from pylinac.core.decorators import value_accept
+from pylinac.core.cache import cached_analysis
 from pylinac.core.geometry import Point, Line, Circle
 from pylinac.core.image import Image
 from pylinac.core.io import get_filepath_UI, get_filenames_UI
@@ -223,6 +224,7 @@ class Starshot:
         return center_point
 
     @value_accept(radius=(0.2, 0.95), min_peak_height=(0.05, 0.95), SID=(40, 400))
+    @cached_analysis(state=True)
     def analyze(self, radius=0.85, min_peak_height=0.25, tolerance=1.0, SID=100, start_point=None, fwhm=True, recursive=True):
         """Analyze the starshot image.
 
@@ -326,6 +328,10 @@ class Starshot:
                                 raise RuntimeError("The algorithm was unable to determine a reasonable wobble. Try setting "
                                                    "recursive to False and manually adjusting algorithm parameters")
 
+    def _cache_inputs(self):
+        """The data the analysis depends on, which keys the analysis cache; see :mod:`~pylinac.core.cache`."""
+        return getattr(self, 'image', None)
+
     @property
     def image_is_loaded(self):
         """Boolean property specifying if an image has been loaded."""
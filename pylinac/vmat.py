@@ -10,6 +10,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 from pylinac.core.decorators import value_accept, type_accept
+from pylinac.core.cache import cached_analysis
 from pylinac.core.image import Image
 from pylinac.core.geometry import Point, Rectangle
 from pylinac.core.io import get_filepath_UI, get_filenames_UI
@@ -211,6 +212,7 @@ class VMAT:
 
     @type_accept(test=str)
     @value_accept(test=test_types, tolerance=(0, 8))
+    @cached_analysis(state=True)
     def analyze(self, test, tolerance=1.5):
         """Analyze the open and DMLC field VMAT images, according to 1 of 2 possible tests.
 
@@ -234,6 +236,11 @@ class VMAT:
         """Analysis"""
         self.segments = SegmentManager(self.image_open, self.image_dmlc, self.settings)
 
+    def _cache_inputs(self):
+        """The data the analysis depends on, which keys the analysis cache; see :mod:`~pylinac.core.cache`."""
+        if self.open_img_is_loaded and self.dmlc_img_is_loaded:
+            return self.image_open, self.image_dmlc, self.settings.x_offset, self.settings.y_offset
+
     def _check_img_inversion(self):
         """Check that the images are correctly inverted."""
         for image in [self.image_open, self.image_dmlc]:
@@ -0,0 +1,133 @@
+import os
+import os.path as osp
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pylinac.core.cache import AnalysisCache, VolumeCache, cached_analysis, content_hash, get_cache, make_key, set_cache_dir
+
+
+class Test_AnalysisCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        set_cache_dir(None)
+        shutil.rmtree(self.dir)
+
+    def test_get_set(self):
+        cache = AnalysisCache(self.dir)
+        self.assertEqual(cache.get('a'), (False, None))
+        cache.set('a', {'value': np.arange(5)})
+        found, value = cache.get('a')
+        self.assertTrue(found)
+        self.assertTrue(np.array_equal(value['value'], np.arange(5)))
+        # corrupt entries are dropped
+        with open(osp.join(self.dir, 'a.pkl'), 'wb') as f:
+            f.write(b'not a pickle')
+        self.assertEqual(cache.get('a'), (False, None))
+        self.assertEqual(cache.size, 0)
+
+    def test_shared(self):
+        cache = AnalysisCache(self.dir)
+        volume = np.ones((100, 100))
+        cache.set('a', [volume, 1], shared=(volume,))
+        self.assertLess(cache.size, volume.nbytes)
+        found, value = cache.get('a', shared=(volume,))
+        self.assertIs(value[0], volume)
+
+    def test_eviction(self):
+        cache = AnalysisCache(self.dir, max_bytes=3000)
+        for idx, key in enumerate(('a', 'b', 'c')):
+            cache.set(key, np.zeros(100))
+            os.utime(osp.join(self.dir, key + '.pkl'), (idx, idx))
+        cache.get('a')  # a is now the most recently used
+        cache.set('d', np.zeros(100))
+        self.assertLessEqual(cache.size, 3000)
+        self.assertFalse(cache.get('b')[0])
+        self.assertTrue(cache.get('a')[0])
+        self.assertTrue(cache.get('d')[0])
+        # the newest entry is kept even if it's larger than the cache
+        cache.set('e', np.zeros(1000))
+        self.assertTrue(cache.get('e')[0])
+        cache.clear()
+        self.assertEqual(cache.size, 0)
+
+    def test_volume_cache(self):
+        cache = VolumeCache(self.dir, max_bytes=30000)
+        self.assertEqual(cache.get('a'), (False, None))
+        volume = np.arange(1000, dtype=np.int16).reshape((10, 10, 10), order='F')
+        cache.set('a', volume, {'uids': ['1', '2']})
+        found, (cached_volume, metadata) = cache.get('a')
+        self.assertTrue(found)
+        self.assertIsInstance(cached_volume, np.memmap)
+        self.assertFalse(cached_volume.flags.writeable)
+        self.assertTrue(np.array_equal(cached_volume, volume))
+        self.assertEqual(metadata, {'uids': ['1', '2']})
+        # evicted volumes are removed along with their metadata
+        cache.set('b', np.zeros((100, 100), dtype=np.int16))
+        os.utime(osp.join(self.dir, 'a.npy'), (0, 0))
+        cache.set('c', np.zeros((100, 100), dtype=np.int16))
+        self.assertFalse(cache.get('a')[0])
+        self.assertFalse(osp.isfile(osp.join(self.dir, 'a.json')))
+        cache.clear()
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_content_hash(self):
+        array = np.arange(10)
+        self.assertEqual(content_hash(array), content_hash(array.copy()))
+        self.assertNotEqual(content_hash(array), content_hash(array.astype(float)))
+        self.assertNotEqual(content_hash((1, 2)), content_hash((2, 1)))
+        self.assertEqual(content_hash({'a': 1, 'b': 2}), content_hash({'b': 2, 'a': 1}))
+        # files are hashed by content, not name
+        file1, file2 = osp.join(self.dir, 'f1'), osp.join(self.dir, 'f2')
+        for file in (file1, file2):
+            with open(file, 'w') as f:
+                f.write('content')
+        self.assertEqual(content_hash(file1), content_hash(file2))
+        self.assertNotEqual(make_key('a', file1), make_key('b', file1))
+
+    def test_cached_analysis(self):
+        calls = []
+
+        class Analysis:
+            def __init__(self, data):
+                self.data = data
+
+            def _cache_inputs(self):
+                return self.data
+
+            @cached_analysis(state=True, ignore=('workers',))
+            def analyze(self, param=1, workers=1):
+                calls.append(param)
+                self.result = self.data.sum() * param
+                return self.result
+
+        # without a cache set, nothing is stored
+        self.assertIsNone(get_cache())
+        Analysis(np.arange(5)).analyze()
+        self.assertEqual(len(calls), 1)
+
+        set_cache_dir(self.dir)
+        self.assertEqual(Analysis(np.arange(5)).analyze(), 10)
+        self.assertEqual(len(calls), 2)
+        # a new instance of the same data is loaded from the cache and its attributes restored
+        analysis = Analysis(np.arange(5))
+        self.assertEqual(analysis.analyze(), 10)
+        self.assertEqual(analysis.result, 10)
+        self.assertEqual(len(calls), 2)
+        # ignored arguments don't change the key
+        Analysis(np.arange(5)).analyze(workers=4)
+        self.assertEqual(len(calls), 2)
+        # different parameters or data are recalculated
+        Analysis(np.arange(5)).analyze(param=2)
+        Analysis(np.arange(6)).analyze()
+        self.assertEqual(len(calls), 4)
+        # instances without cacheable inputs aren't cached
+        analysis = Analysis(np.arange(5))
+        analysis._cache_inputs = lambda: None
+        analysis.analyze()
+        self.assertEqual(len(calls), 5)
@@ -85,6 +85,62 @@ class Test_Decorators(unittest.TestCase):
 
         self.assertLess(cached_access_time, first_access_time)
 
+    def test_instance_lazyproperty(self):
+
+        class ExpensiveClass:
+            num_calcs = 0
+
+            @lazyproperty
+            def expensive_property(self):
+                self.num_calcs += 1
+                return self.num_calcs
+
+        ec = ExpensiveClass()
+        self.assertEqual(ec.expensive_property, 1)
+        self.assertEqual(ec.expensive_property, 1)
+        # values are per instance
+        self.assertEqual(ExpensiveClass().expensive_property, 1)
+        # and are recalculated once cleared
+        clear_caches(ec)
+        self.assertEqual(ec.expensive_property, 2)
+
+    def test_instance_cache(self):
+
+        class ExpensiveClass:
+            num_calcs = 0
+
+            @instance_cache(maxsize=2)
+            def expensive_method(self, size=10):
+                self.num_calcs += 1
+                return np.zeros(size)
+
+        ec = ExpensiveClass()
+        ec.expensive_method()
+        ec.expensive_method(10)
+        ec.expensive_method(size=10)
+        self.assertEqual(ec.num_calcs, 1)
+        self.assertEqual(ec.expensive_method.cache_info(), (1, 80))
+        # the least recently used result is evicted past maxsize
+        ec.expensive_method(20)
+        ec.expensive_method(30)
+        ec.expensive_method(20)
+        self.assertEqual(ec.num_calcs, 3)
+        ec.expensive_method(10)
+        self.assertEqual(ec.num_calcs, 4)
+        # and past maxbytes, keeping the newest result
+        ExpensiveClass.expensive_method.maxbytes = 100
+        ec.expensive_method(5)
+        self.assertEqual(ec.expensive_method.cache_info(), (1, 40))
+        ec.expensive_method(50)
+        self.assertEqual(ec.expensive_method.cache_info(), (1, 400))
+        # caches are per instance and can be cleared
+        self.assertEqual(ExpensiveClass().expensive_method.cache_info(), (0, 0))
+        ec.expensive_method.cache_clear()
+        self.assertEqual(ec.expensive_method.cache_info(), (0, 0))
+        ec.expensive_method(50)
+        clear_caches(ec)
+        self.assertEqual(ec.expensive_method.cache_info(), (0, 0))
+
     # def test_unwrap_func(self):
     #     #TODO: can't figure this one out
     #     class DumbClass:
@@ -1,12 +1,16 @@
 import unittest
 import os
 import os.path as osp
+import pickle
+import shutil
+import tempfile
 import time
 
 import numpy as np
 from dicom.errors import InvalidDicomError
 
-from pylinac.cbct import CBCT
+from pylinac.cbct import CBCT, Settings
+from pylinac.core.cache import set_volume_cache_dir
 from pylinac.core.geometry import Point
 
 
@@ -37,6 +41,45 @@ class Test_General(unittest.TestCase):
         zfile = osp.join(varian_test_file_dir, 'Pelvis.zip')
         CBCT.from_zip_file(zfile)
 
+    def test_loaded_images(self):
+        """Test that the images are sorted by slice position and that loading in parallel gives the same volume."""
+        folder = osp.join(varian_test_file_dir, 'Pelvis')
+        filelist = self.cbct._get_CT_filenames_from_folder(folder)
+        self.cbct._load_files(filelist, workers=1)
+        images = self.cbct.settings.images
+        self.assertEqual(images.shape, (512, 512, len(filelist)))
+        self.assertEqual(images.dtype, np.int16)
+
+        self.cbct._load_files(filelist[::-1], workers=4)
+        self.assertTrue(np.array_equal(images, self.cbct.settings.images))
+
+    def test_targeted_loading(self):
+        """Test that a targeted load decodes the images of the analyzed slices, and not all of them."""
+        zfile = osp.join(varian_test_file_dir, 'Pelvis.zip')
+        full = CBCT.from_zip_file(zfile).settings
+        targeted = CBCT.from_zip_file(zfile, targeted=True).settings
+        decoded = [num for num in range(targeted.num_images) if targeted.images[:, :, num].any()]
+        self.assertLess(len(decoded), targeted.num_images)
+        for attr in ('hu_slice_num', 'un_slice_num', 'sr_slice_num', 'lc_slice_num'):
+            slice_num = getattr(targeted, attr)
+            self.assertEqual(slice_num, getattr(full, attr))
+            for num in (slice_num - 1, slice_num, slice_num + 1):
+                self.assertTrue(np.array_equal(targeted.images[:, :, num], full.images[:, :, num]))
+
+    def test_volume_cache(self):
+        """Test that images loaded again are memory-mapped from the volume cache."""
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.addCleanup(set_volume_cache_dir, None)
+        images = CBCT(osp.join(varian_test_file_dir, 'Pelvis')).settings.images
+
+        set_volume_cache_dir(cache_dir)
+        for _ in range(2):
+            cbct = CBCT.from_zip_file(osp.join(varian_test_file_dir, 'Pelvis.zip'))
+            self.assertIsInstance(cbct.settings.images, np.memmap)
+            self.assertTrue(np.array_equal(cbct.settings.images, images))
+        self.assertEqual(len(os.listdir(cache_dir)), 2)  # the volume and its metadata
+
     def test_images_not_loaded(self):
         """Raise error if trying to analyze when images aren't loaded yet."""
         self.assertRaises(AttributeError, self.cbct.analyze)
@@ -87,6 +130,31 @@ class Test_General(unittest.TestCase):
         # roll the phantom data by 4 slices
         np.roll(self.cbct.settings.images, 4, axis=2)
 
+    def test_HU_slice_search(self):
+        """Test that the HU linearity slice search finds the slice a check of every image does."""
+        def brute_force_slice(settings):
+            return int(np.median([num for num in range(settings.num_images) if settings._is_HU_slice(num)]))
+
+        for dataset in ('Pelvis', 'Pelvis.zip', 'Low dose thorax.zip', 'Unknown large FOV.zip'):
+            path = osp.join(varian_test_file_dir, dataset)
+            settings = (CBCT.from_zip_file(path) if dataset.endswith('.zip') else CBCT(path)).settings
+            self.assertEqual(settings.hu_slice_num, brute_force_slice(settings), dataset)
+
+        # shift the phantom and check the candidates in parallel
+        hu_slice_num = settings.hu_slice_num
+        settings = Settings(np.roll(settings.images, 40, axis=0), settings.dicom_metadata)
+        settings.workers = 2
+        self.assertEqual(settings.hu_slice_num, hu_slice_num)
+        # the number of workers isn't pickled, e.g. with cached analyses
+        self.assertEqual(pickle.loads(pickle.dumps(settings)).workers, 1)
+
+        # an image within the module that fails the check doesn't stop the search, even from a candidate at one edge
+        settings = Settings(settings.images.copy(), settings.dicom_metadata)
+        hu_slices = [num for num in range(settings.num_images) if settings._is_HU_slice(num)]
+        settings.images[:, :, hu_slices[len(hu_slices) // 2 - 1]] = 0
+        settings._find_HU_slice_candidates = lambda: [hu_slices[0]]
+        self.assertEqual(settings.hu_slice_num, brute_force_slice(settings))
+
     def test_save_image(self):
         """Test that saving an image does something."""
         filename = 'saved_img.jpg'
@@ -167,6 +235,13 @@ class CBCTMixin:
             meas_dist = line.length_mm(self.cbct.settings.mm_per_pixel)
             self.assertAlmostEqual(exp_dist, meas_dist, delta=0.08)
 
+    def test_parallel_analysis(self):
+        """Test that analyzing the modules concurrently gives the same results."""
+        self.cbct.analyze()
+        results = self.cbct.return_results()
+        self.cbct.analyze(workers=3)
+        self.assertEqual(self.cbct.return_results(), results)
+
     def test_MTF_values(self):
         """Test MTF values."""
         self.cbct.analyze()
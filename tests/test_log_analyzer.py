@@ -1,12 +1,25 @@
+import gc
 import os
-from unittest import TestCase
+import queue
+import shutil
+import tempfile
+import weakref
+from unittest import TestCase, skipIf
 import time
 import os.path as osp
 
-from pylinac.log_analyzer import MachineLog, MachineLogs, log_types
+import numpy as np
 
+from pylinac.log_analyzer import MachineLog, MachineLogs, LogScanner, LogWatcher, MLC, Leaf_Axis, \
+    FluenceAccumulator, log_types, read_dlog_snapshots, write_columnar, write_synthetic_tlog, write_synthetic_dlog
+from pylinac.core.cache import set_cache_dir
 from tests.utils import save_file
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 
 class TestLogLoading(TestCase):
     """Tests of dynalog files, mostly using the demo file."""
@@ -60,6 +73,36 @@ class TestLogLoading(TestCase):
         log = MachineLog(log_no_txt)
         self.assertFalse(hasattr(log, 'txt'))
 
+    def test_tlog_axes_are_views(self):
+        """Test that tlog axis data views the snapshot block of the file rather than copying it."""
+        test_tlog = osp.join(self.test_dir, 'tlogs', "qqq2106_4DC Treatment_JS0_TX_20140712095629.bin")
+        axis_data = MachineLog(test_tlog).axis_data
+        self.assertEqual(axis_data.gantry.actual.dtype, np.float32)
+        self.assertTrue(np.may_share_memory(axis_data.gantry.actual, axis_data.couch.vert.actual))
+        # leaf positions are held in contiguous leaves-x-snapshots arrays that the leaf axes view
+        mlc = axis_data.mlc
+        self.assertEqual(mlc.actual.shape, (120, len(axis_data.gantry.actual)))
+        self.assertTrue(mlc.actual.flags.c_contiguous)
+        self.assertTrue(np.may_share_memory(mlc.leaf_axes[120].expected, mlc.expected))
+        self.assertTrue(np.array_equal(mlc.leaf_axes[120].expected, mlc.expected[-1]))
+
+    def test_header_only(self):
+        """Test that header-only loading defers reading the axis data until it's accessed."""
+        test_tlog = osp.join(self.test_dir, 'tlogs', "qqq2106_4DC Treatment_JS0_TX_20140712095629.bin")
+        test_dlog = osp.join(self.test_dir, 'dlogs', 'Adlog1.dlg')
+        for log_file in (test_tlog, test_dlog):
+            log = MachineLog(log_file, header_only=True)
+            self.assertTrue(log.is_loaded)
+            self.assertIsNone(log._axis_data)
+            self.assertEqual(log.header.num_mlc_leaves, 120)
+            # accessing the axis data reads it in
+            self.assertEqual(log.axis_data.mlc.num_leaves, 120)
+            self.assertIsNotNone(log._axis_data)
+
+        # the fluence structure is also built upon access
+        log = MachineLog(test_tlog, header_only=True)
+        self.assertEqual(log.fluence.actual.calc_map().shape, (60, 4000))
+
     def test_from_url(self):
         url = 'https://s3.amazonaws.com/assuranceqa-staging/uploads/imgs/Tlog2.bin'
         log = MachineLog.from_url(url)
@@ -103,6 +146,23 @@ class TestDynalogDemo(TestCase):
         self.assertEqual(axis_data.jaws.y1.actual[-1], 20)
         self.assertRaises(AttributeError, axis_data.jaws.x2.plot_expected)
 
+    def test_read_snapshots(self):
+        """Test the bulk parse of the snapshot data of both the A- and B-files."""
+        for name in ('AQA.dlg', 'BQA.dlg'):
+            matrix = read_dlog_snapshots(osp.join(osp.dirname(self.log.filename), name))
+            self.assertEqual(matrix.shape, (99, 254))
+        self.assertEqual(matrix[0, 5], 25000)
+        # malformed snapshots raise rather than being dropped
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        with open(osp.join(osp.dirname(self.log.filename), 'AQA.dlg')) as f:
+            lines = f.read().strip().split('\n')
+        for last_row in ('x,' + lines[-1].split(',', 1)[1], lines[-1].rsplit(',', 1)[0] + ',x', lines[-1][:10]):
+            corrupt_file = osp.join(tmp_dir, 'Acorrupt.dlg')
+            with open(corrupt_file, 'w') as f:
+                f.write('\n'.join(lines[:-1] + [last_row]))
+            self.assertRaises(ValueError, read_dlog_snapshots, corrupt_file)
+
     def test_mlc(self):
         """Test integrity of MLC data & methods."""
         mlc = self.log.axis_data.mlc
@@ -119,11 +179,46 @@ class TestDynalogDemo(TestCase):
         self.assertAlmostEqual(mlc.leaf_axes[120].expected[-1], -4.994, delta=0.001)
         self.assertAlmostEqual(mlc.leaf_axes[1].difference[0], 0, delta=0.1)
 
+    def test_mlc_arrays(self):
+        """Test that the leaf axes view the MLC position arrays and that leaves can still be added one at a time."""
+        mlc = self.log.axis_data.mlc
+        self.assertEqual(mlc.actual.dtype, np.float32)
+        self.assertEqual(mlc.expected.shape, (120, 99))
+        self.assertEqual(len(mlc.leaf_axes), 120)
+        self.assertTrue(np.may_share_memory(mlc.leaf_axes[61].actual, mlc.actual))
+        self.assertRaises(KeyError, mlc.leaf_axes.__getitem__, 121)
+
+        new_mlc = MLC(mlc.snapshot_idx)
+        for leaf_num, leaf in mlc.leaf_axes.items():
+            new_mlc.add_leaf_axis(Leaf_Axis(leaf.actual.copy(), leaf.expected.copy()), leaf_num)
+        self.assertTrue(np.array_equal(new_mlc.actual, mlc.actual))
+        self.assertTrue(np.array_equal(new_mlc.expected, mlc.expected))
+        self.assertAlmostEqual(new_mlc.get_RMS_avg(), mlc.get_RMS_avg())
+
+        # the position arrays grow geometrically instead of being reallocated for every leaf
+        self.assertLessEqual(len(new_mlc._actual_buffer), 2 * mlc.num_leaves)
+        self.assertTrue(np.may_share_memory(new_mlc.actual, new_mlc._actual_buffer))
+        self.assertTrue(new_mlc.actual.flags['C_CONTIGUOUS'])
+        # skipped leaves are zero-filled and adding a lower leaf doesn't reallocate
+        new_mlc.add_leaf_axis(Leaf_Axis(mlc.leaf_axes[1].actual.copy(), mlc.leaf_axes[1].expected.copy()), 125)
+        self.assertEqual(new_mlc.num_leaves, 125)
+        self.assertFalse(new_mlc.actual[120:124].any())
+        buffer = new_mlc._actual_buffer
+        new_mlc.add_leaf_axis(Leaf_Axis(mlc.leaf_axes[2].actual.copy(), mlc.leaf_axes[2].expected.copy()), 122)
+        self.assertIs(new_mlc._actual_buffer, buffer)
+        self.assertTrue(np.array_equal(new_mlc.leaf_axes[122].actual, mlc.leaf_axes[2].actual))
+
     def test_mlc_leafpair_moved(self):
         mlc = self.log.axis_data.mlc
         self.assertTrue(mlc.leaf_moved(9))
         self.assertFalse(mlc.leaf_moved(8))
         self.assertTrue(mlc.pair_moved(3))
+        # the movement masks are precomputed for all leaves and pairs
+        self.assertEqual(mlc.leaves_moved.shape, (120,))
+        self.assertEqual(mlc.pairs_moved.sum(), 60)
+        self.assertTrue(np.array_equal(mlc.moving_leaves, np.flatnonzero(mlc.leaves_moved) + 1))
+        self.assertTrue(np.array_equal(mlc.get_leaves('b', only_moving_leaves=True),
+                                       mlc.moving_leaves[mlc.moving_leaves > 60]))
 
     def test_RMS_error(self):
         mlc = self.log.axis_data.mlc
@@ -139,6 +234,8 @@ class TestDynalogDemo(TestCase):
     def test_under_jaws(self):
         mlc = self.log.axis_data.mlc
         self.assertFalse(mlc.leaf_under_y_jaw(4))
+        self.assertEqual(mlc.pairs_under_y_jaw.shape, (60,))
+        self.assertEqual(mlc.pairs_under_y_jaw[3], mlc.leaf_under_y_jaw(4))
 
     def test_save_to_csv(self):
         # should raise error since it's a dynalog
@@ -203,6 +300,136 @@ class TestDlogFluence(TestCase):
         self.assertAlmostEqual(fluence.gamma.avg_gamma, 0.019, delta=0.005)
         self.assertAlmostEqual(fluence.gamma.histogram()[0][0], 155804, delta=100)
 
+    def test_fluence_methods_agree(self):
+        """Test that the vectorized fluence engine reproduces the snapshot loop."""
+        for fluence in (self.log.fluence.actual, self.log.fluence.expected):
+            for resolution in (0.1, 0.15):
+                loop_map = fluence.calc_map(resolution, method='loop')
+                vector_map = fluence.calc_map(resolution, method='vectorized')
+                self.assertTrue(np.allclose(loop_map, vector_map))
+
+        with self.assertRaises(ValueError):
+            self.log.fluence.actual.calc_map(method='fast')
+
+    def test_gamma_maps(self):
+        gamma = self.log.fluence.gamma
+        gamma_map = gamma.calc_map(calc_individual_maps=True)
+        # pass/fail map is the same shape as the gamma map
+        self.assertEqual(gamma.passfail_map.shape, gamma_map.shape)
+        self.assertEqual(gamma.passfail_map.sum(), np.sum(gamma_map >= 1))
+        # the fluence maps aren't thresholded in place
+        self.assertGreater(np.sum((self.log.fluence.actual.pixel_map > 0) & (self.log.fluence.actual.pixel_map < 0.1)), 0)
+        # each component of gamma is at least as large as gamma itself
+        for component_map in (gamma.doseTA_map, gamma.distTA_map):
+            self.assertEqual(component_map.shape, gamma_map.shape)
+            self.assertTrue(np.all(component_map >= gamma_map - 1e-6))
+
+    def test_search_gamma(self):
+        gamma = self.log.fluence.gamma
+        gamma_map = gamma.calc_map(method='search', calc_individual_maps=True)
+        self.assertAlmostEqual(gamma.pass_prcnt, 100, delta=0.1)
+        self.assertAlmostEqual(gamma.avg_gamma, 0.015, delta=0.005)
+        # gamma is capped by the search radius (3x distTA by default)
+        self.assertLessEqual(gamma_map.max(), 3)
+        self.assertLessEqual(gamma.calc_map(method='search', search_radius=0.5).max(), 0.5)
+        # gamma is made up of the dose and distance terms of the matching pixel
+        self.assertTrue(np.allclose(np.hypot(gamma.doseTA_map, gamma.distTA_map), gamma_map, atol=1e-4))
+        with self.assertRaises(ValueError):
+            gamma.calc_map(method='low')
+
+    def test_caches(self):
+        fluence = self.log.fluence.actual
+        # cached results still set the pixel map
+        fluence.calc_map(0.1)
+        fluence.calc_map(0.2)
+        fluence.calc_map(0.1)
+        self.assertEqual(fluence.pixel_map.shape, (60, 4000))
+        self.assertEqual(fluence.resolution, 0.1)
+        # caches live on the log, so an analyzed log can be freed
+        log = MachineLog()
+        log.load_demo_dynalog()
+        log.fluence.gamma.calc_map()
+        log_ref = weakref.ref(log)
+        del log
+        gc.collect()
+        self.assertIsNone(log_ref())
+
+    def test_fluence_pyramid(self):
+        log = MachineLog()
+        log.load_demo_dynalog()
+        fine_map = log.fluence.actual.calc_map(0.1)
+        for resolution in (0.2, 0.5, 1.0):
+            log.fluence.gamma.calc_map(resolution=resolution, base_resolution=0.1)
+            bin_size = int(round(resolution / 0.1))
+            binned_map = fine_map.reshape(60, -1, bin_size).mean(axis=2)
+            self.assertTrue(np.allclose(log.fluence.actual.pixel_map, binned_map))
+            self.assertEqual(log.fluence.expected.base_resolution, 0.1)
+        # each fluence was calculated once
+        self.assertEqual(log.fluence.actual._fluence_map.cache_info()[0], 1)
+        self.assertEqual(log.fluence.expected._fluence_map.cache_info()[0], 1)
+        self.assertRaises(ValueError, log.fluence.actual.calc_map, 0.3, base_resolution=0.1)
+
+    def test_snapshot_windows(self):
+        log = MachineLog()
+        log.load_demo_dynalog()
+        fluence = log.fluence.actual
+        full_map = fluence.calc_map()
+        # the windows of a log add up to its whole map, whether calculated separately or accumulated
+        first_half = fluence.calc_map(snapshots=slice(0, 50))
+        second_half = fluence.calc_map(snapshots=slice(50, None), method='loop')
+        self.assertTrue(np.allclose(first_half + second_half, full_map))
+        accumulator = FluenceAccumulator()
+        for start in range(0, 99, 10):
+            accumulator.add(log, np.arange(start, min(start + 10, 99)))
+        self.assertEqual(accumulator.num_windows, 10)
+        self.assertTrue(np.allclose(accumulator.pixel_map, full_map))
+        self.assertRaises(AttributeError, getattr, FluenceAccumulator(), 'pixel_map')
+        # gamma of a window
+        log.fluence.gamma.calc_map(snapshots=slice(0, 50))
+        self.assertIs(log.fluence.expected.snapshots, log.fluence.actual.snapshots)
+        log.fluence.gamma.calc_map()
+        self.assertIsNone(log.fluence.actual.snapshots)
+        self.assertAlmostEqual(log.fluence.gamma.pass_prcnt, 99.85, delta=0.1)
+
+    def test_dtype(self):
+        dlog = osp.join(osp.dirname(osp.dirname(__file__)), 'pylinac', 'demo_files', 'log_reader', 'AQA.dlg')
+        tlog = osp.join(osp.dirname(__file__), 'test_files', 'MLC logs', 'tlogs',
+                        "qqq2106_4DC Treatment_JS0_TX_20140712095629.bin")
+        for filename in (dlog, tlog):
+            double = MachineLog(filename, dtype=np.float64)
+            single = MachineLog(filename, dtype=np.float32)
+            for log, dtype in ((double, np.float64), (single, np.float32)):
+                log.fluence.gamma.calc_map()
+                self.assertEqual(log.axis_data.mu.actual.dtype, dtype)
+                self.assertEqual(log.axis_data.mlc.actual.dtype, dtype)
+                self.assertEqual(log.fluence.actual.pixel_map.dtype, dtype)
+                self.assertEqual(log.fluence.gamma.pixel_map.dtype, dtype)
+            # single precision results agree with double precision
+            self.assertTrue(np.allclose(single.fluence.actual.pixel_map, double.fluence.actual.pixel_map, atol=1e-6))
+            self.assertAlmostEqual(single.fluence.gamma.avg_gamma, double.fluence.gamma.avg_gamma, delta=1e-5)
+            self.assertAlmostEqual(single.fluence.gamma.pass_prcnt, double.fluence.gamma.pass_prcnt, delta=0.01)
+            self.assertAlmostEqual(single.axis_data.mlc.get_RMS_avg(), double.axis_data.mlc.get_RMS_avg(), delta=1e-6)
+        # by default trajectory log data stays in the precision it's stored in
+        log = MachineLog(tlog)
+        self.assertEqual(log.axis_data.mu.actual.dtype, np.float32)
+        self.assertEqual(log.fluence.actual.calc_map().dtype, np.float64)
+
+    def test_analysis_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.addCleanup(set_cache_dir, None)
+        set_cache_dir(cache_dir)
+        results = []
+        for _ in range(2):
+            log = MachineLog()
+            log.load_demo_dynalog()
+            log.fluence.gamma.calc_map()
+            results.append((log.fluence.gamma.pass_prcnt, log.fluence.gamma.pixel_map, log.fluence.actual.pixel_map))
+        self.assertTrue(os.listdir(cache_dir))
+        self.assertEqual(results[0][0], results[1][0])
+        self.assertTrue(np.array_equal(results[0][1], results[1][1], equal_nan=True))
+        self.assertTrue(np.array_equal(results[0][2], results[1][2]))
+
 
 class TestTlogDemo(TestCase):
 
@@ -296,6 +523,13 @@ class TestTlogFluence(TestCase):
         self.assertAlmostEqual(fluence.gamma.avg_gamma, 0.001, delta=0.005)
         self.assertAlmostEqual(fluence.gamma.histogram()[0][0], 240000, delta=100)
 
+    def test_fluence_methods_agree(self):
+        """Test that the vectorized fluence engine reproduces the snapshot loop."""
+        for fluence in (self.log.fluence.actual, self.log.fluence.expected):
+            loop_map = fluence.calc_map(method='loop')
+            vector_map = fluence.calc_map(method='vectorized')
+            self.assertTrue(np.allclose(loop_map, vector_map))
+
     def test_plotting(self):
         # raise error if map hasn't yet been calc'ed.
         with self.assertRaises(AttributeError):
@@ -315,6 +549,12 @@ class TestTlogFluence(TestCase):
             val = getattr(self.log.subbeams[0], item)
             self.assertAlmostEqual(val.actual, expval, delta=0.1)
 
+    def test_subbeam_fluence(self):
+        subbeam = self.log.subbeams[0]
+        subbeam_map = self.log.fluence.actual.calc_map(snapshots=subbeam.snapshots)
+        self.assertEqual(subbeam_map.shape, (60, 4000))
+        self.assertLessEqual(subbeam_map.max(), self.log.fluence.actual.calc_map().max())
+
 
 class Test_MachineLogs(TestCase):
     _logs_dir = osp.abspath(osp.join(osp.dirname(__file__), '.', 'test_files', 'MLC logs'))
@@ -366,6 +606,70 @@ class Test_MachineLogs(TestCase):
         logs = MachineLogs(log_dir, verbose=False)
         self.assertEqual(logs.num_logs, 1)
 
+    def test_scanner(self):
+        """Test that the scanner pairs dynalogs, yielding the A-file, and counts unmatched files as skipped."""
+        scanner = LogScanner(osp.join(self._logs_dir, 'some_matches_missing'))
+        logs = list(scanner)
+        self.assertEqual(logs, [(osp.join(self._logs_dir, 'some_matches_missing', 'Adlog2.dlg'), log_types['dlog'])])
+        self.assertEqual(scanner.num_logs, 1)
+        self.assertEqual(scanner.num_skipped, 1)
+
+        scanner = LogScanner(self.mix_type_dir)
+        log_types_found = [log_type for _, log_type in scanner]
+        self.assertEqual(log_types_found.count(log_types['tlog']), 2)
+        self.assertEqual(log_types_found.count(log_types['dlog']), 1)
+
+        # dynalogs not named A*/B* are skipped rather than raising an error
+        scanner = LogScanner(osp.join(self._logs_dir, 'bad_names'))
+        self.assertEqual(list(scanner), [])
+        self.assertEqual(scanner.num_skipped, 1)
+
+    def test_watcher(self):
+        """Test that the watcher summarizes logs once they're completely written and only once."""
+        watch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, watch_dir)
+        dlog_dir = osp.join(self._logs_dir, 'dlogs')
+        shutil.copy(osp.join(dlog_dir, 'Adlog1.dlg'), watch_dir)  # already there; not summarized
+        summaries = queue.Queue()
+        watcher = LogWatcher(watch_dir, queue=summaries, interval=0)
+        self.assertEqual(watcher.poll(), [])
+
+        # the dynalog is summarized once its B-file is written and both are stable
+        shutil.copy(osp.join(dlog_dir, 'Bdlog1.dlg'), watch_dir)
+        self.assertEqual(watcher.poll(), [])
+        summary = watcher.poll()[0]
+        self.assertEqual(summary['filename'], osp.join(watch_dir, 'Adlog1.dlg'))
+        self.assertEqual(summary['log_type'], log_types['dlog'])
+
+        # a trajectory log isn't summarized until it holds all of its snapshots
+        tlog = osp.join(self._logs_dir, 'tlogs', "qqq2106_4DC Treatment_JS0_TX_20140712095629.bin")
+        with open(tlog, 'rb') as f:
+            data = f.read()
+        new_tlog = osp.join(watch_dir, 'new.bin')
+        with open(new_tlog, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        self.assertEqual(watcher.poll() + watcher.poll(), [])
+        with open(new_tlog, 'wb') as f:
+            f.write(data)
+        watcher.poll()
+        summary = watcher.poll()[0]
+        self.assertEqual(summary['filename'], new_tlog)
+        self.assertAlmostEqual(summary['rms_avg'], MachineLog(tlog).axis_data.mlc.get_RMS_avg())
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.num_logs, 2)
+        self.assertEqual(summaries.qsize(), 2)
+
+        # existing logs can be included and the directory watched in the background
+        found = queue.Queue()
+        watcher = LogWatcher(watch_dir, queue=found, interval=0.01, include_existing=True)
+        watcher.start()
+        try:
+            summaries = [found.get(timeout=60) for _ in range(2)]
+        finally:
+            watcher.stop()
+        self.assertEqual({summary['filename'] for summary in summaries}, {osp.join(watch_dir, 'Adlog1.dlg'), new_tlog})
+        self.assertTrue(found.empty())
+
     def test_append(self):
         # append a directory
         logs = MachineLogs()
@@ -398,4 +702,147 @@ class Test_MachineLogs(TestCase):
     def test_avg_gamma_pct(self):
         logs = MachineLogs(self.logs_dir, recursive=False, verbose=False)
         gamma = logs.avg_gamma_pct()
-        self.assertAlmostEqual(gamma, 100, delta=0.01)
\ No newline at end of file
+        self.assertAlmostEqual(gamma, 100, delta=0.01)
+
+    def test_analyze(self):
+        logs = MachineLogs(self.logs_dir, recursive=False, verbose=False)
+        with self.assertRaises(AttributeError):
+            logs.results
+        results = logs.analyze(verbose=False)
+        self.assertEqual(len(results), 7)
+        self.assertAlmostEqual(results['gamma_pass_pct'].mean(), 100, delta=0.1)
+        self.assertEqual(results['num_beamholds'].sum(), 0)
+        # aggregates read from the results rather than recalculating
+        self.assertEqual(logs.avg_gamma(verbose=False), results['avg_gamma'].mean())
+
+    def test_results_follow_logs(self):
+        """Test that the aggregates are recalculated when a log is replaced, even if the number of logs is the same."""
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        logs = MachineLogs(self.logs_dir, recursive=False, verbose=False)
+        avg_gamma = logs.avg_gamma(verbose=False)
+        filename = write_synthetic_dlog(osp.join(tmp_dir, 'Aoffset.dlg'), num_snapshots=500, leaf_offset=0.1,
+                                        seed=0)[0]
+        logs[0] = MachineLog(filename)
+        self.assertNotAlmostEqual(logs.avg_gamma(verbose=False), avg_gamma)
+        logs.pop()
+        logs.append(MachineLog(filename))
+        self.assertAlmostEqual(logs.avg_gamma(verbose=False), logs.analyze(verbose=False)['avg_gamma'].mean())
+
+    def test_analyze_parallel(self):
+        logs = MachineLogs(self.logs_dir, recursive=False, verbose=False)
+        serial_results = logs.analyze(verbose=False)
+        parallel_results = logs.analyze(workers=2, verbose=False)
+        for field in ('avg_gamma', 'gamma_pass_pct', 'rms_avg', 'rms_max', 'num_beamholds'):
+            self.assertTrue(np.allclose(serial_results[field], parallel_results[field]))
+
+    def test_iter_folder(self):
+        logs = list(MachineLogs.iter_folder(self.logs_dir, recursive=False))
+        self.assertEqual(len(logs), 7)
+        self.assertIsInstance(logs[0], MachineLog)
+
+    def test_summarize_folder(self):
+        summary = MachineLogs.summarize_folder(self.logs_dir, recursive=False, verbose=False)
+        self.assertEqual(summary.num_logs, 7)
+        self.assertEqual(len(summary.filenames), 7)
+        self.assertAlmostEqual(summary.avg_gamma, 0, delta=0.002)
+        self.assertAlmostEqual(summary.avg_gamma_pct, 100, delta=0.01)
+        self.assertEqual(summary.num_beamholds, 0)
+        # the streamed summary matches that of the retained logs
+        logs = MachineLogs(self.logs_dir, recursive=False, verbose=False)
+        self.assertAlmostEqual(summary.avg_gamma, logs.avg_gamma(verbose=False))
+
+    def test_to_columnar(self):
+        logs = MachineLogs(self.mix_type_dir, verbose=False)
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        filename = osp.join(tmp_dir, 'logs.npz')
+        logs.to_columnar(filename)
+        data = np.load(filename)
+        self.assertEqual(len(data['filenames']), 3)
+        self.assertEqual(len(data['log_id']), sum(len(log.axis_data.mu.actual) for log in logs))
+        for log_id, log in enumerate(logs):
+            rows = data['log_id'] == log_id
+            self.assertTrue(np.allclose(data['leaf_5_actual'][rows], log.axis_data.mlc.leaf_axes[5].actual))
+        # dynalogs have no couch data
+        self.assertTrue(np.isnan(data['couch_lat_actual'][data['log_id'] == 0]).all())
+        # streamed logs write the same data
+        stream_filename = osp.join(tmp_dir, 'stream.npz')
+        write_columnar(MachineLogs.iter_folder(self.mix_type_dir), stream_filename)
+        np.testing.assert_array_equal(np.load(stream_filename)['gantry_actual'], data['gantry_actual'])
+        self.assertRaises(ValueError, logs.to_columnar, 'logs.csv')
+
+    @skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_to_columnar_arrow(self):
+        import pyarrow.parquet as pq
+        logs = MachineLogs(self.mix_type_dir, verbose=False)
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        for extension, read in (('.parquet', pq.read_table),
+                                ('.arrow', lambda f: pyarrow.ipc.open_file(f).read_all())):
+            filename = osp.join(tmp_dir, 'logs' + extension)
+            logs.to_columnar(filename)
+            table = read(filename)
+            self.assertEqual(table.num_rows, sum(len(log.axis_data.mu.actual) for log in logs))
+            log_ids = table.column('log_id').to_numpy()
+            filenames = np.array(table.column('filename').to_pylist())
+            leaf_5 = table.column('leaf_5_actual').to_numpy()
+            for log_id, log in enumerate(logs):
+                rows = log_ids == log_id
+                self.assertEqual(set(filenames[rows]), {str(log._filename_str)})
+                self.assertTrue(np.allclose(leaf_5[rows], log.axis_data.mlc.leaf_axes[5].actual))
+
+
+class Test_SyntheticLogs(TestCase):
+    """Tests of the synthetic log generator."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def test_tlog(self):
+        for version in (2.1, 3.0):
+            filename = write_synthetic_tlog(osp.join(self.tmp_dir, 'tlog{}.bin'.format(version)), num_snapshots=500,
+                                            version=version, mlc_model=3, num_subbeams=2, num_beam_holds=2)
+            log = MachineLog(filename)
+            self.assertEqual(log.log_type, log_types['tlog'])
+            self.assertEqual(log.header.version, version)
+            self.assertEqual(log.header.num_snapshots, 500)
+            self.assertTrue(log.axis_data.mlc.hdmlc)
+            self.assertEqual(log.axis_data.mlc.num_leaves, 120)
+            # the beam hold snapshots are excluded
+            self.assertEqual(log.axis_data.mlc.num_snapshots, 480)
+            self.assertEqual([subbeam.beam_name for subbeam in log.subbeams], ['Field 1', 'Field 2'])
+            self.assertEqual([subbeam.control_point for subbeam in log.subbeams], [0, 10])
+            self.assertEqual(log.txt['Beam Name'], 'Field 1')
+            self.assertEqual(log.axis_data.mlc.get_RMS_max(), 0)
+
+    def test_dlog(self):
+        a_filename, b_filename = write_synthetic_dlog(osp.join(self.tmp_dir, 'A1.dlg'), num_snapshots=500,
+                                                      num_leaves=80, num_beam_holds=3)
+        self.assertEqual(b_filename, osp.join(self.tmp_dir, 'B1.dlg'))
+        log = MachineLog(b_filename)
+        self.assertEqual(log.log_type, log_types['dlog'])
+        self.assertEqual(log.axis_data.mlc.num_leaves, 80)
+        self.assertEqual(log.axis_data.num_beamholds, 3)
+        self.assertEqual(log.axis_data.mlc.num_snapshots, 470)
+        self.assertRaises(ValueError, write_synthetic_dlog, osp.join(self.tmp_dir, 'dlog.dlg'))
+
+    def test_error_injection(self):
+        filename = write_synthetic_tlog(osp.join(self.tmp_dir, 'tlog.bin'), leaf_error=0.05, seed=0)
+        log = MachineLog(filename)
+        self.assertAlmostEqual(log.axis_data.mlc.get_RMS_avg(), 0.05, delta=0.002)
+        log.fluence.gamma.calc_map()
+        self.assertLess(log.fluence.gamma.pass_prcnt, 100)
+        write_synthetic_dlog(osp.join(self.tmp_dir, 'A1.dlg'), leaf_offset=0.1)
+        log = MachineLog(osp.join(self.tmp_dir, 'A1.dlg'))
+        self.assertAlmostEqual(log.axis_data.mlc.get_RMS_avg(), 0.1, delta=0.002)
+        self.assertRaises(ValueError, write_synthetic_tlog, filename, num_leaves=119)
+
+    def test_machinelogs(self):
+        for num in range(3):
+            write_synthetic_tlog(osp.join(self.tmp_dir, 'tlog{}.bin'.format(num)), num_snapshots=100)
+            write_synthetic_dlog(osp.join(self.tmp_dir, 'A{}.dlg'.format(num)), num_snapshots=100)
+        logs = MachineLogs(self.tmp_dir, verbose=False)
+        self.assertEqual(logs.num_tlogs, 3)
+        self.assertEqual(logs.num_dlogs, 3)